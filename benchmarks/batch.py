@@ -0,0 +1,54 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from calcium.batch import compile_files
+
+from .corpus import write_tree
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(description="Scaling of the batch driver from 1 to N worker processes.")
+    argument_parser.add_argument("root", nargs="?", help="tree of Calcium sources (a synthetic one is generated if omitted)")
+    argument_parser.add_argument("--files", type=int, default=1000, help="size of the synthetic tree")
+    argument_parser.add_argument("--max-jobs", type=int, default=os.cpu_count() or 1)
+    argument_parser.add_argument("--start-method", choices=multiprocessing.get_all_start_methods())
+    arguments = argument_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        root = arguments.root or directory
+
+        if arguments.root is None:
+            write_tree(directory, arguments.files)
+
+        baseline = None
+        powers = (2 ** power for power in range(arguments.max_jobs.bit_length()) if 2 ** power <= arguments.max_jobs)
+
+        for jobs in sorted({*powers, arguments.max_jobs}):
+            start = time.perf_counter()
+            files = sum(1 for _ in compile_files([root], jobs, start_method=arguments.start_method))
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"{jobs:3d} jobs: {elapsed:8.2f}s {files / elapsed:10.1f} files/s  speedup {baseline / elapsed:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+import statistics
+import threading
+import time
+
+from calcium.cancel import CancellationToken, ParseCancelledError, parse_cancellable
+from calcium.lexer import CalciumLexer
+from calcium.parser import CalciumParser
+
+from .corpus import generate_source
+
+
+def _cancel(token: CancellationToken, cancelled_at: list[float]) -> None:
+    cancelled_at.append(time.perf_counter())
+    token.cancel()
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(description="Overhead of polling a cancellation token, and latency of cancelling.")
+    argument_parser.add_argument("--members", type=int, default=200)
+    argument_parser.add_argument("--repeat", type=int, default=5)
+    arguments = argument_parser.parse_args()
+
+    source = generate_source(0, arguments.members)
+    plain = []
+    polled = []
+
+    for _ in range(arguments.repeat):
+        start = time.perf_counter()
+        CalciumParser(CalciumLexer(source)).parse()
+        plain.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        parse_cancellable(source, CancellationToken())
+        polled.append(time.perf_counter() - start)
+
+    plain_time = statistics.median(plain)
+    polled_time = statistics.median(polled)
+    print(f"{arguments.members} members, {len(source)} characters")
+    print(f"parse:              {plain_time * 1000:8.2f} ms")
+    print(f"parse with polling: {polled_time * 1000:8.2f} ms ({(polled_time / plain_time - 1) * 100:+.1f}%)")
+
+    latencies = []
+
+    for index in range(arguments.repeat):
+        token = CancellationToken()
+        cancelled_at: list[float] = []
+        # Cancel somewhere in the middle of the parse.
+        timer = threading.Timer(plain_time * (index + 1) / (arguments.repeat + 1), _cancel, (token, cancelled_at))
+        timer.start()
+
+        try:
+            parse_cancellable(source, token)
+        except ParseCancelledError:
+            latencies.append(time.perf_counter() - cancelled_at[0])
+
+        timer.cancel()
+
+    if latencies:
+        print(f"cancellation latency: median {statistics.median(latencies) * 1000:.3f} ms, max {max(latencies) * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import random
+
+# Synthetic Calcium sources shaped like a real package tree: a header with a few imports and one struct with fields,
+# methods and static initializers.
+
+
+def generate_source(index: int, members: int = 20, seed: int | None = None) -> str:
+    rng = random.Random(index if seed is None else seed)
+    lines = [f"package bench.pkg{index % 17}.unit{index};", ""]
+
+    for i in range(rng.randint(1, 6)):
+        lines.append(f"import Dep{i}, Helper{i} as H{i} from bench.pkg{rng.randrange(17)}.unit{rng.randrange(max(index, 1))};")
+
+    lines += ["", f"public struct Unit{index} {{"]
+
+    for i in range(members):
+        kind = rng.randrange(4)
+
+        if kind == 0:
+            lines.append(f"    var field{i}: int = Expression;")
+        elif kind == 1:
+            lines.append(f"    const constant{i}: long;")
+        elif kind == 2:
+            statements = " ".join(["BlockStatement"] * rng.randint(1, 8))
+            lines += [f"    func method{i}(x: int, y: bool) -> int {{", f"        {statements}", "    }"]
+        else:
+            lines += ["    static {", "        BlockStatement", "    }"]
+
+    lines += ["}", ""]
+    return "\n".join(lines)
+
+
+def generate_expression(rng: random.Random, depth: int) -> str:
+    if depth == 0:
+        return rng.choice(["Expression", "value", "42", "this"])
+
+    operand = generate_expression(rng, depth - 1)
+    kind = rng.randrange(6)
+
+    if kind == 0:
+        return f"{operand} ? {generate_expression(rng, depth - 1)} : {generate_expression(rng, depth - 1)}"
+    elif kind == 1:
+        return f"{operand}.member{depth}"
+    elif kind == 2:
+        return f"{operand}->member{depth}"
+    elif kind == 3:
+        return f"call{depth}({operand}, {generate_expression(rng, depth - 1)})"
+    elif kind == 4:
+        return f"{operand}[{generate_expression(rng, depth - 1)}]"
+
+    return f"&({operand})"
+
+
+def generate_expression_source(index: int, fields: int = 50, depth: int = 4) -> str:
+    rng = random.Random(index)
+    lines = [f"struct Initializers{index} {{"]
+
+    for i in range(fields):
+        lines.append(f"    var field{i}: int = {generate_expression(rng, depth)};")
+
+    lines += ["}", ""]
+    return "\n".join(lines)
+
+
+def write_tree(root: str, files: int, members: int = 20) -> list[str]:
+    paths = []
+
+    for index in range(files):
+        directory = os.path.join(root, f"pkg{index % 17}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"unit{index}.ca")
+
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(generate_source(index, members))
+
+        paths.append(path)
+
+    return paths
+
+
+def find_sources(root: str) -> list[str]:
+    return sorted(os.path.join(directory, name) for directory, _, names in os.walk(root) for name in names if name.endswith(".ca"))
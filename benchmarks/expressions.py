@@ -0,0 +1,46 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+import time
+
+from calcium.lexer import CalciumLexer
+from calcium.parser import CalciumParser
+
+from .corpus import generate_expression_source
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(description="Parse throughput on expression-heavy initializers.")
+    argument_parser.add_argument("--files", type=int, default=50)
+    argument_parser.add_argument("--fields", type=int, default=50)
+    argument_parser.add_argument("--depth", type=int, default=4, help="nesting depth of the generated expressions")
+    arguments = argument_parser.parse_args()
+
+    sources = [generate_expression_source(index, arguments.fields, arguments.depth) for index in range(arguments.files)]
+    terminals = sum(len(list(CalciumLexer(source).terminals())) for source in sources)
+    start = time.perf_counter()
+
+    for source in sources:
+        CalciumParser(CalciumLexer(source)).parse()
+
+    elapsed = time.perf_counter() - start
+    print(f"{arguments.files} files, {arguments.files * arguments.fields} initializers, {terminals} terminals")
+    print(f"{elapsed:.3f}s: {terminals / elapsed:,.0f} terminals/s, {arguments.files * arguments.fields / elapsed:,.0f} initializers/s")
+
+
+if __name__ == "__main__":
+    main()
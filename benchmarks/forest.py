@@ -0,0 +1,79 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+import pickle
+import sys
+import time
+
+from calcium.forest import NodeView, dump, forest_root, load
+from calcium.lexer import CalciumLexer, ReplayLexer
+from calcium.parser import CalciumParser
+
+from .corpus import generate_source
+
+
+def _walk(root: NodeView) -> int:
+    seen = {root.index}
+    stack = [root]
+
+    while stack:
+        node = stack.pop()
+        node.kind
+        node.terminal
+
+        for child in node.children:
+            if child.index not in seen:
+                seen.add(child.index)
+                stack.append(child)
+
+    return len(seen)
+
+
+def _time(function, repeat: int) -> float:
+    start = time.perf_counter()
+
+    for _ in range(repeat):
+        function()
+
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(description="Size and speed of the binary forest format vs. pickle.")
+    argument_parser.add_argument("--members", type=int, default=200)
+    argument_parser.add_argument("--repeat", type=int, default=10)
+    arguments = argument_parser.parse_args()
+    # Pickle recurses along the forest.
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 100000))
+
+    source = generate_source(0, arguments.members)
+    terminals = list(CalciumLexer(source).terminals())
+    root = forest_root(CalciumParser(ReplayLexer(source, terminals)).parse())
+    data = dump(root, terminals)
+    pickled = pickle.dumps(root, pickle.HIGHEST_PROTOCOL)
+    nodes = _walk(load(data).root)
+    print(f"{arguments.members} members, {len(source)} characters, {nodes} nodes")
+    print(f"size:           forest {len(data):10d} B   pickle {len(pickled):10d} B")
+    print(f"dump:           forest {_time(lambda: dump(root, terminals), arguments.repeat) * 1000:8.2f} ms "
+          f"pickle {_time(lambda: pickle.dumps(root, pickle.HIGHEST_PROTOCOL), arguments.repeat) * 1000:8.2f} ms")
+    print(f"load:           forest {_time(lambda: load(data), arguments.repeat) * 1000:8.2f} ms "
+          f"pickle {_time(lambda: pickle.loads(pickled), arguments.repeat) * 1000:8.2f} ms")
+    print(f"load and walk:  forest {_time(lambda: _walk(load(data).root), arguments.repeat) * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+import tempfile
+import time
+from typing import Callable
+
+from calcium.header import scan_header
+from calcium.lexer import CalciumLexer
+from calcium.parser import CalciumParser
+
+from .corpus import find_sources, write_tree
+
+
+def _files_per_second(sources: list[str], function: Callable[[str], object]) -> float:
+    start = time.perf_counter()
+
+    for source in sources:
+        function(source)
+
+    return len(sources) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(description="Header-only import scan vs. full parse, in files per second.")
+    argument_parser.add_argument("root", nargs="?", help="tree of Calcium sources (a synthetic one is generated if omitted)")
+    argument_parser.add_argument("--files", type=int, default=2000, help="size of the synthetic tree")
+    arguments = argument_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = find_sources(arguments.root) if arguments.root else write_tree(directory, arguments.files)
+        sources = []
+
+        for path in paths:
+            with open(path, encoding="utf-8") as file:
+                sources.append(file.read())
+
+    header = _files_per_second(sources, scan_header)
+    full = _files_per_second(sources, lambda source: CalciumParser(CalciumLexer(source)).parse())
+    print(f"{len(sources)} files")
+    print(f"scan_header:   {header:10.1f} files/s")
+    print(f"CalciumParser: {full:10.1f} files/s ({header / full:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
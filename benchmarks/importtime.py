@@ -0,0 +1,83 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Cumulative import time allowed for each module, in milliseconds, on a warm bytecode cache.
+BUDGETS_MS = {
+    "calcium.client": 35.0,
+    "calcium.lexer": 30.0,
+    "calcium.parser": 50.0
+}
+
+
+# Parses the report of -X importtime: "import time: self [us] | cumulative | imported package" lines, nested imports
+# being indented under the module that imports them.
+def parse_importtime(report: str) -> list[tuple[str, int, int, int]]:
+    imports = []
+
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+
+        own, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((name.strip(), int(own), int(cumulative), depth))
+
+    return imports
+
+
+def measure(module: str) -> list[tuple[str, int, int, int]]:
+    environment = {**os.environ}
+    # Bytecode caches are written by the warm-up run, so that compiling the sources is not measured.
+    environment.pop("PYTHONDONTWRITEBYTECODE", None)
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], env=environment, capture_output=True,
+                             text=True, check=True)
+    return parse_importtime(process.stderr)
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(description="Import time of the calcium modules, checked against a budget.")
+    argument_parser.add_argument("modules", nargs="*", default=list(BUDGETS_MS))
+    argument_parser.add_argument("--runs", type=int, default=7)
+    argument_parser.add_argument("--budget-ms", type=float, help="budget for every module (default: BUDGETS_MS)")
+    argument_parser.add_argument("--top", type=int, default=5, help="number of slowest imports listed for each module")
+    arguments = argument_parser.parse_args()
+    over = 0
+
+    for module in arguments.modules:
+        measure(module)
+        runs = [measure(module) for _ in range(arguments.runs)]
+        totals = [next(cumulative for name, _, cumulative, _ in run if name == module) for run in runs]
+        total = statistics.median(totals) / 1000
+        budget = arguments.budget_ms or BUDGETS_MS.get(module, 0.0)
+        status = "over" if budget and total > budget else "ok"
+        over += status == "over"
+        print(f"{module}: {total:.2f} ms (budget {budget:.2f} ms) {status}")
+        median = runs[totals.index(sorted(totals)[len(totals) // 2])]
+
+        for name, own, _, depth in sorted(median, key=lambda entry: entry[1], reverse=True)[:arguments.top]:
+            print(f"    {own / 1000:8.2f} ms  {'  ' * depth}{name}")
+
+    sys.exit(1 if over != 0 else 0)
+
+
+if __name__ == "__main__":
+    main()
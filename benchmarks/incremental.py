@@ -0,0 +1,58 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+import random
+import time
+
+from calcium.incremental import Edit, parse_incremental, reparse
+from calcium.lexer import CalciumLexer
+from calcium.parser import CalciumParser
+
+from .corpus import generate_source
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(description="Incremental reparse latency vs. full parse after single-member edits.")
+    argument_parser.add_argument("--members", type=int, default=500)
+    argument_parser.add_argument("--edits", type=int, default=50)
+    arguments = argument_parser.parse_args()
+
+    source = generate_source(0, arguments.members)
+    start = time.perf_counter()
+    CalciumParser(CalciumLexer(source)).parse()
+    full = time.perf_counter() - start
+    result = parse_incremental(source)
+    rng = random.Random(0)
+    latencies = []
+
+    for _ in range(arguments.edits):
+        members = result.pieces[-1].members
+        member = members[rng.randrange(len(members))]
+        # Prepend a harmless field to the member: an edit of a few terminals.
+        edit = Edit(member.start, member.start, f"var edited{len(latencies)}: int; ")
+        start = time.perf_counter()
+        result = reparse(result, edit)
+        latencies.append(time.perf_counter() - start)
+
+    latencies.sort()
+    print(f"{arguments.members} members, {len(source)} characters")
+    print(f"full parse:  {full * 1000:8.2f} ms")
+    print(f"reparse p50: {latencies[len(latencies) // 2] * 1000:8.2f} ms, max {latencies[-1] * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
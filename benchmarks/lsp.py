@@ -0,0 +1,112 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+import json
+import random
+import subprocess
+import sys
+import time
+from typing import Any
+
+from calcium.incremental import parse_incremental
+from calcium.lsp import position
+
+from .corpus import generate_source
+
+_URI = "file:///benchmark.ca"
+
+
+class _Connection:
+    def __init__(self, debounce: float) -> None:
+        self.process = subprocess.Popen([sys.executable, "-m", "calcium.lsp", "--debounce", str(debounce)], stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE)
+
+    def send(self, message: dict[str, Any]) -> None:
+        body = json.dumps({"jsonrpc": "2.0", **message}).encode()
+        self.process.stdin.write(f"Content-Length: {len(body)}\r\n\r\n".encode() + body)  # type: ignore[union-attr]
+        self.process.stdin.flush()  # type: ignore[union-attr]
+
+    def receive(self) -> dict[str, Any]:
+        length = 0
+
+        while (line := self.process.stdout.readline()) not in (b"\r\n", b""):  # type: ignore[union-attr]
+            name, _, value = line.decode("ascii").partition(":")
+
+            if name.lower() == "content-length":
+                length = int(value)
+
+        return json.loads(self.process.stdout.read(length))  # type: ignore[union-attr]
+
+    # Diagnostics published for version, skipping those of older versions.
+    def diagnostics(self, version: int) -> list[dict[str, Any]]:
+        while True:
+            message = self.receive()
+
+            if message.get("method") == "textDocument/publishDiagnostics" and message["params"].get("version") == version:
+                return message["params"]["diagnostics"]
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(description="Latency from an edit to its diagnostics in calcium.lsp.")
+    argument_parser.add_argument("--members", type=int, default=500)
+    argument_parser.add_argument("--edits", type=int, default=50, help="edits, the last of which leaves a syntax error")
+    argument_parser.add_argument("--debounce", type=float, default=0.0)
+    arguments = argument_parser.parse_args()
+
+    text = generate_source(0, arguments.members)
+    connection = _Connection(arguments.debounce)
+    connection.send({"id": 0, "method": "initialize", "params": {"capabilities": {}}})
+    connection.receive()
+    connection.send({"method": "initialized", "params": {}})
+    start = time.perf_counter()
+    document = {"uri": _URI, "languageId": "calcium", "version": 0, "text": text}
+    connection.send({"method": "textDocument/didOpen", "params": {"textDocument": document}})
+    connection.diagnostics(0)
+    opened = time.perf_counter() - start
+    members = parse_incremental(text).pieces[-1].members
+    rng = random.Random(0)
+    latencies = []
+
+    for version in range(1, arguments.edits + 1):
+        # Prepend a field to a member, as benchmarks.incremental does, or break the member on the last edit.
+        member = members[rng.randrange(len(members))]
+        inserted = f"var edited{version}: int; " if version != arguments.edits else "var broken: "
+        where = position(text, member.start)
+        text = text[:member.start] + inserted + text[member.start:]
+        members = parse_incremental(text).pieces[-1].members if version != arguments.edits else members
+        start = time.perf_counter()
+        connection.send({"method": "textDocument/didChange", "params": {
+            "textDocument": {"uri": _URI, "version": version},
+            "contentChanges": [{"range": {"start": where, "end": where}, "text": inserted}]
+        }})
+        diagnostics = connection.diagnostics(version)
+        latencies.append(time.perf_counter() - start)
+
+    connection.send({"id": 1, "method": "shutdown"})
+    connection.receive()
+    connection.send({"method": "exit"})
+    connection.process.wait()
+    broken = latencies.pop()
+    latencies.sort()
+    print(f"{arguments.members} members, {len(text)} characters")
+    print(f"open:         {opened * 1000:8.2f} ms")
+    print(f"edit p50:     {latencies[len(latencies) // 2] * 1000:8.2f} ms, max {latencies[-1] * 1000:.2f} ms")
+    print(f"broken edit:  {broken * 1000:8.2f} ms, {diagnostics}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from calcium.client import Client, ServerError
+
+from .corpus import generate_source
+
+
+def _client(socket: str, sources: list[str], requests: int, latencies: list[float]) -> None:
+    with Client(socket) as client:
+        for index in range(requests):
+            start = time.perf_counter()
+            client.check(source=sources[index % len(sources)])
+            latencies.append(time.perf_counter() - start)
+
+
+def _wait_for(socket: str, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+
+    while True:
+        try:
+            with Client(socket) as client:
+                client.request("ping")
+                return
+        except (OSError, ServerError):
+            if time.monotonic() > deadline:
+                raise
+
+            time.sleep(0.05)
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(description="Latency of calcium.server under concurrent clients.")
+    argument_parser.add_argument("--socket", help="socket of a running server (one is started if omitted)")
+    argument_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="workers of the started server")
+    argument_parser.add_argument("--clients", type=int, default=8)
+    argument_parser.add_argument("--requests", type=int, default=100, help="requests sent by each client")
+    argument_parser.add_argument("--members", type=int, default=10, help="members of each synthetic source")
+    arguments = argument_parser.parse_args()
+
+    sources = [generate_source(index, arguments.members, index) for index in range(16)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        socket = arguments.socket or os.path.join(directory, "calcium.sock")
+        server = None
+
+        if arguments.socket is None:
+            server = subprocess.Popen([sys.executable, "-m", "calcium.server", "--socket", socket, "--workers", str(arguments.workers)])
+
+        try:
+            _wait_for(socket, 30)
+            latencies: list[float] = []
+            threads = [threading.Thread(target=_client, args=(socket, sources, arguments.requests, latencies)) for _ in range(arguments.clients)]
+            start = time.perf_counter()
+
+            for thread in threads:
+                thread.start()
+
+            for thread in threads:
+                thread.join()
+
+            elapsed = time.perf_counter() - start
+
+            with Client(socket) as client:
+                metrics = client.request("metrics")
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    latencies.sort()
+    print(f"{arguments.clients} clients, {len(latencies)} requests, {len(latencies) / elapsed:.1f} requests/s")
+    print(f"latency p50 {latencies[len(latencies) // 2] * 1000:.2f} ms, p99 {latencies[len(latencies) * 99 // 100] * 1000:.2f} ms, "
+          f"max {latencies[-1] * 1000:.2f} ms")
+    print(f"server: {metrics}")
+
+
+if __name__ == "__main__":
+    main()
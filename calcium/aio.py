@@ -0,0 +1,162 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from .cancel import CancellationToken, ParseCancelledError, parse_cancellable
+from .diagnostics import SOURCE_ERRORS, Diagnostic
+from .forest import dump, forest_root
+from .lexer import CalciumLexer, ReplayLexer
+
+# Requests gathered into one executor job, and how long the first of them waits for others.
+BATCH_SIZE = 16
+BATCH_DELAY = 0.001
+# Requests accepted before callers wait for earlier ones to complete.
+MAX_PENDING = 256
+
+Terminals = list[tuple[str, int, int]]
+
+
+def _lex(source: str) -> tuple[Terminals, Diagnostic | None]:
+    terminals: Terminals = []
+
+    try:
+        for terminal in CalciumLexer(source).terminals():
+            terminals.append((type(terminal).__name__, terminal.start_position, terminal.end_position))
+    except SOURCE_ERRORS as error:
+        return terminals, Diagnostic.from_error(error)
+
+    return terminals, None
+
+
+def _parse(source: str, token: CancellationToken, forest: bool) -> tuple[bytes | None, Diagnostic | None]:
+    # The forest is parsed from the terminals it is dumped with, so that its nodes share them.
+    try:
+        terminals = list(CalciumLexer(source).terminals()) if forest else None
+        node = parse_cancellable(source, token, ReplayLexer(source, terminals) if terminals is not None else None)
+    except SOURCE_ERRORS as error:
+        return None, Diagnostic.from_error(error)
+
+    return dump(forest_root(node), terminals) if terminals is not None else None, None
+
+
+# Runs in the executor. Tokens only reach jobs run by threads; in processes, a cancelled request is parsed anyway and
+# its result dropped. Cancelled requests yield None.
+def run_batch(command: str, sources: list[str], tokens: list[CancellationToken] | None) -> list[object]:
+    results: list[object] = []
+
+    for index, source in enumerate(sources):
+        token = tokens[index] if tokens is not None else CancellationToken()
+
+        try:
+            if token.cancelled:
+                raise ParseCancelledError()
+
+            if command == "lex":
+                results.append(_lex(source))
+            elif command == "check":
+                results.append(_parse(source, token, False)[1])
+            else:
+                results.append(_parse(source, token, True))
+        except ParseCancelledError:
+            results.append(None)
+
+    return results
+
+
+@dataclass(slots=True)
+class _Request:
+    source: str
+    future: asyncio.Future = field(repr=False)
+    token: CancellationToken = field(default_factory=CancellationToken)
+
+
+# Lexes and parses off the event loop, in executor (the default executor of the loop if None). Concurrent requests
+# of the same command are sent to the executor in batches, and callers past max_pending wait for a free slot.
+# Cancelling a call cancels its parse at the next production when the executor runs threads.
+class AsyncParser:
+    def __init__(self, executor: Executor | None = None, batch_size: int = BATCH_SIZE, batch_delay: float = BATCH_DELAY,
+                 max_pending: int = MAX_PENDING) -> None:
+        self.executor = executor
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self._slots = asyncio.Semaphore(max_pending)
+        self._pending: dict[str, list[_Request]] = {"lex": [], "check": [], "parse": []}
+        self._timers: dict[str, asyncio.TimerHandle] = {}
+
+    async def lex(self, source: str) -> tuple[Terminals, Diagnostic | None]:
+        return await self._request("lex", source)  # type: ignore[return-value]
+
+    async def check(self, source: str) -> Diagnostic | None:
+        return await self._request("check", source)  # type: ignore[return-value]
+
+    # Forest in the format of calcium.forest, or None with the diagnostic.
+    async def parse(self, source: str) -> tuple[bytes | None, Diagnostic | None]:
+        return await self._request("parse", source)  # type: ignore[return-value]
+
+    async def _request(self, command: str, source: str) -> object:
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            request = _Request(source, loop.create_future())
+            pending = self._pending[command]
+            pending.append(request)
+
+            if len(pending) >= self.batch_size:
+                self._flush(command)
+            elif len(pending) == 1:
+                self._timers[command] = loop.call_later(self.batch_delay, self._flush, command)
+
+            try:
+                return await request.future
+            except asyncio.CancelledError:
+                request.token.cancel()
+
+                # Not yet flushed: drop it from the next batch.
+                if request in self._pending[command]:
+                    self._pending[command].remove(request)
+
+                raise
+
+    def _flush(self, command: str) -> None:
+        timer = self._timers.pop(command, None)
+
+        if timer is not None:
+            timer.cancel()
+
+        batch = self._pending[command]
+        self._pending[command] = []
+
+        if not batch:
+            return
+
+        tokens = None if isinstance(self.executor, ProcessPoolExecutor) else [request.token for request in batch]
+        job = asyncio.get_running_loop().run_in_executor(self.executor, run_batch, command, [request.source for request in batch], tokens)
+        job.add_done_callback(lambda job: _deliver(batch, job))
+
+
+def _deliver(batch: list[_Request], job: asyncio.Future) -> None:
+    for index, request in enumerate(batch):
+        if request.future.done():
+            continue
+
+        if job.cancelled():
+            request.future.cancel()
+        elif job.exception() is not None:
+            request.future.set_exception(job.exception())  # type: ignore[arg-type]
+        else:
+            request.future.set_result(job.result()[index])
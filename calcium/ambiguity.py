@@ -0,0 +1,135 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+from dataclasses import asdict, dataclass
+import heapq
+import json
+import sys
+
+from alchemist.front.parser import GraphNode, Production
+
+from .diagnostics import SOURCE_ERRORS, Diagnostic
+from .instrument import Observer, observing
+from .lexer import CalciumLexer
+from .parser import CalciumParser
+
+TOP = 20
+
+
+# One derivation of a production, from the end of its input terminal to the end of the furthest terminal it reached.
+@dataclass(slots=True, order=True)
+class Span:
+    # Distinct paths derived, over all the terminals reached.
+    paths: int
+    production: str
+    start: int
+    end: int
+    # Distinct terminals reached; paths above this are ambiguities, several derivations ending on the same terminal.
+    terminals: int
+
+
+@dataclass(slots=True)
+class AmbiguityReport:
+    productions: int
+    max_paths: int
+    # Derivations of the whole input, more than one meaning the grammar is ambiguous on it.
+    derivations: int
+    fan_out: list[Span]
+    ambiguities: list[Span]
+    diagnostic: Diagnostic | None = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def _end(node: GraphNode) -> int:
+    return node.path.end_position if node.path is not None else 0
+
+
+# Keeps the spans with the largest fan-out and the largest ambiguities, in bounded memory.
+class AmbiguityRecorder(Observer):
+    def __init__(self, top: int = TOP) -> None:
+        self.top = top
+        self.productions = 0
+        self.max_paths = 0
+        self._fan_out: list[Span] = []
+        self._ambiguities: list[Span] = []
+
+    def _keep(self, heap: list[Span], span: Span) -> None:
+        if len(heap) < self.top:
+            heapq.heappush(heap, span)
+        elif span > heap[0]:
+            heapq.heapreplace(heap, span)
+
+    def leave(self, production: Production, error: BaseException | None) -> None:
+        self.productions += 1
+
+        if error is not None:
+            return
+
+        output_paths = production.output_paths
+        paths = sum(len(nodes) for nodes in output_paths.values())
+        self.max_paths = max(self.max_paths, paths)
+        span = Span(paths, type(production).__name__, _end(production.input_path), max(terminal.end_position for terminal in output_paths),
+                    len(output_paths))
+
+        if paths > 1:
+            self._keep(self._fan_out, span)
+
+        if paths > span.terminals:
+            self._keep(self._ambiguities, span)
+
+    def report(self, root: Production | None, diagnostic: Diagnostic | None = None) -> AmbiguityReport:
+        derivations = max((len(nodes) for nodes in root.output_paths.values()), default=0) if root is not None else 0
+        return AmbiguityReport(self.productions, self.max_paths, derivations, sorted(self._fan_out, reverse=True),
+                               sorted(self._ambiguities, reverse=True), diagnostic)
+
+
+def ambiguity_report(source: str, top: int = TOP) -> AmbiguityReport:
+    recorder = AmbiguityRecorder(top)
+
+    with observing(recorder):
+        try:
+            root = CalciumParser(CalciumLexer(source)).parse()
+        except SOURCE_ERRORS as error:
+            return recorder.report(None, Diagnostic.from_error(error))
+
+    return recorder.report(root)
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(prog="python -m calcium.ambiguity",
+                                              description="Report the spans of the largest fan-out and the ambiguities of each file, as JSON.")
+    argument_parser.add_argument("paths", nargs="+")
+    argument_parser.add_argument("--top", type=int, default=TOP, help="spans kept in each list")
+    argument_parser.add_argument("--max-paths", type=int, help="only report the files that reach more paths than this")
+    arguments = argument_parser.parse_args()
+    reports = {}
+
+    for path in arguments.paths:
+        with open(path, encoding="utf-8") as file:
+            report = ambiguity_report(file.read(), arguments.top)
+
+        if arguments.max_paths is None or report.max_paths > arguments.max_paths:
+            reports[path] = report.to_dict()
+
+    json.dump(reports, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
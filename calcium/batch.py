@@ -0,0 +1,338 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+import multiprocessing
+import os
+import sys
+import time
+from typing import Any, Iterable, Iterator
+
+from .cache import CACHE_BYTES, CacheEntry, ParseCache
+from .diagnostics import SOURCE_ERRORS, Diagnostic
+from .forest import dump, forest_root
+from .instrument import observing
+from .lexer import CalciumLexer, ReplayLexer
+from .limits import LimitObserver, Limits, ParseLimitError
+from .metrics import ParseMetrics
+from .parser import CalciumParser
+from .shared import SharedForestRef, prepare_workers, share
+from .warm import warm_up
+
+SOURCE_SUFFIX = ".ca"
+# Files are grouped into chunks of about this many bytes, so that small files do not pay one dispatch each.
+CHUNK_BYTES = 256 * 1024
+# Kind of the diagnostic of a file the compiler failed on, the message naming the exception.
+INTERNAL_ERROR = "InternalError"
+
+
+@dataclass(slots=True)
+class FileResult:
+    path: str
+    size: int
+    seconds: float
+    diagnostic: Diagnostic | None = None
+    # Forest of the file when parsed with share_forests and free of errors; see calcium.shared for its lifetime.
+    forest: SharedForestRef | None = None
+
+
+# A file over the limits gets a ParseLimitError diagnostic, which is not cached: the limits may differ on the next run.
+def parse_file(path: str, cache: ParseCache | None = None, share_forests: bool = False, limits: Limits = Limits(),
+               metrics: ParseMetrics | None = None) -> FileResult:
+    result, tokens = _parse_file(path, cache, share_forests, limits, metrics)
+
+    if metrics is not None:
+        metrics.record(result.size, tokens, result.seconds, result.diagnostic.kind if result.diagnostic is not None else None)
+
+    return result
+
+
+# Also returns the number of terminals of the file, or None if it failed to lex or was not lexed.
+def _parse_file(path: str, cache: ParseCache | None, share_forests: bool, limits: Limits,
+                metrics: ParseMetrics | None) -> tuple[FileResult, int | None]:
+    start = time.perf_counter()
+
+    # A file that cannot be read or decoded gets a diagnostic of its own instead of failing the batch.
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+    except OSError as error:
+        return FileResult(path, 0, time.perf_counter() - start, Diagnostic.from_error(error)), None
+
+    try:
+        source = data.decode("utf-8")
+    except UnicodeDecodeError as error:
+        return FileResult(path, len(data), time.perf_counter() - start, Diagnostic.from_error(error)), None
+
+    key = None
+
+    if cache is not None and not cache.by_terminals:
+        key = cache.key(data)
+        cached = _lookup(cache, key, share_forests, metrics)
+
+        if cached is not None:
+            return _cached_result(path, len(data), start, cached, share_forests)
+
+    terminals = None
+    entry = None
+    forest = None
+
+    lexer = CalciumLexer(source)
+
+    try:
+        # The terminals are lexed once for the cache entry (and its fingerprint), the metrics, the forest and the parse
+        # alike.
+        if cache is not None or metrics is not None or share_forests:
+            terminals = list(lexer.terminals())
+            lexer = ReplayLexer(source, terminals)
+
+        if cache is not None:
+            assert terminals is not None
+            entry = CacheEntry.from_terminals(terminals)
+
+            if cache.by_terminals:
+                key = cache.terminals_key(entry.fingerprint)
+                cached = _lookup(cache, key, share_forests, metrics)
+
+                if cached is not None:
+                    return _cached_result(path, len(data), start, cached, share_forests)
+
+        if limits:
+            with observing(LimitObserver(limits)):
+                node = CalciumParser(lexer).parse()
+        else:
+            node = CalciumParser(lexer).parse()
+
+        diagnostic = None
+
+        if entry is not None or share_forests:
+            assert terminals is not None
+            forest_data = dump(forest_root(node), terminals)
+
+            if entry is not None:
+                entry.forest = forest_data
+
+            if share_forests:
+                forest = share(forest_data)
+    except SOURCE_ERRORS as error:
+        diagnostic = Diagnostic.from_error(error)
+    except ParseLimitError as error:
+        result = FileResult(path, len(data), time.perf_counter() - start, Diagnostic.from_error(error))
+        return result, len(terminals) if terminals is not None else None
+    # A failure of the compiler on this file rather than an error of its source, such as running out of memory, is
+    # reported for the file alone, under a kind of its own, and not cached.
+    except Exception as error:
+        result = FileResult(path, len(data), time.perf_counter() - start, Diagnostic(INTERNAL_ERROR, f"{type(error).__name__}: {error}"))
+        return result, len(terminals) if terminals is not None else None
+
+    # Without terminals, a lexical error is cached under the key of the bytes only.
+    if cache is not None and key is not None:
+        entry = entry or CacheEntry.from_terminals((), diagnostic)
+        entry.diagnostic = diagnostic
+        cache.put(key, entry)
+
+    result = FileResult(path, len(data), time.perf_counter() - start, diagnostic, forest)
+    # terminals is None after a lexical error, or when nothing needed them.
+    return result, len(terminals) if terminals is not None else None
+
+
+# An entry found by its terminals only stands for a source with the same positions, which its diagnostic and forest
+# rely on: it is used when both are absent or not needed.
+def _lookup(cache: ParseCache, key: str, share_forests: bool, metrics: ParseMetrics | None) -> CacheEntry | None:
+    if cache.by_terminals and share_forests:
+        return None
+
+    cached = cache.get(key, lambda entry: not cache.by_terminals or entry.diagnostic is None)
+
+    if metrics is not None:
+        metrics.cache_lookup(cached is not None)
+
+    return cached
+
+
+# The entry of a lexical error is the one with a diagnostic but no terminals, which are then unknown.
+def _cached_result(path: str, size: int, start: float, cached: CacheEntry, share_forests: bool) -> tuple[FileResult, int | None]:
+    forest = share(cached.forest) if share_forests and cached.forest is not None else None
+    tokens = len(cached.terminals) // 3 if cached.terminals or cached.diagnostic is None else None
+    return FileResult(path, size, time.perf_counter() - start, cached.diagnostic, forest), tokens
+
+
+# Workers collect metrics into a registry of their own, whose snapshot goes back with the results for the parent to
+# merge, along with the hits and misses of their copy of the cache.
+def _parse_chunk(paths: list[str], cache: ParseCache | None, share_forests: bool, limits: Limits,
+                 collect_metrics: bool) -> tuple[list[FileResult], dict[str, Any] | None, tuple[int, int]]:
+    metrics = ParseMetrics() if collect_metrics else None
+    hits, misses = (cache.hits, cache.misses) if cache is not None else (0, 0)
+    results = [parse_file(path, cache, share_forests, limits, metrics) for path in paths]
+    counts = (cache.hits - hits, cache.misses - misses) if cache is not None else (0, 0)
+    return results, metrics.registry.snapshot() if metrics is not None else None, counts
+
+
+def collect_sources(paths: Iterable[str]) -> list[str]:
+    sources = []
+
+    for path in paths:
+        if os.path.isdir(path):
+            sources += sorted(os.path.join(directory, name) for directory, _, names in os.walk(path) for name in names
+                              if name.endswith(SOURCE_SUFFIX))
+        else:
+            sources.append(path)
+
+    return sources
+
+
+# A file whose size cannot be read is still parsed, to get the diagnostic of the error.
+def _size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+# Largest files first, so that the longest jobs start early and the small ones fill the gaps at the end. Chunks are
+# kept small enough for every worker to get several of them.
+def make_chunks(paths: Iterable[str], jobs: int, chunk_bytes: int = CHUNK_BYTES) -> list[list[str]]:
+    sizes = sorted(((_size(path), path) for path in paths), reverse=True)
+    chunk_bytes = max(min(chunk_bytes, sum(size for size, _ in sizes) // (jobs * 4)), 1)
+    chunks: list[list[str]] = []
+    size = 0
+
+    for path_size, path in sizes:
+        if len(chunks) == 0 or size + path_size > chunk_bytes:
+            chunks.append([])
+            size = 0
+
+        chunks[-1].append(path)
+        size += path_size
+
+    return chunks
+
+
+# Workers start with the parser warmed up by calcium.warm: with the "fork" start method, this process warms it up before
+# forking them, and with "forkserver", the fork server does by preloading calcium._preload, so that the workers share
+# its state copy-on-write. With "spawn", each worker warms it up as it starts.
+def _pool(jobs: int, start_method: str | None) -> ProcessPoolExecutor:
+    context = multiprocessing.get_context(start_method)
+
+    if context.get_start_method() == "fork":
+        warm_up()
+        return ProcessPoolExecutor(jobs, context)
+
+    if context.get_start_method() == "forkserver":
+        context.set_forkserver_preload(["calcium._preload"])
+        return ProcessPoolExecutor(jobs, context)
+
+    return ProcessPoolExecutor(jobs, context, warm_up)
+
+
+# Chunks go through the single call queue of the pool, from which every idle worker takes the next one, so no worker
+# sits idle while work is left. Results are yielded as their chunks complete.
+#
+# With share_forests, workers hand forests back in shared memory instead of through the result queue, and the caller
+# owns the forest of every result it receives (see calcium.shared).
+#
+# With metrics, the metrics of every file are recorded into it, including those parsed by workers.
+def compile_files(paths: Iterable[str], jobs: int | None = None, chunk_bytes: int = CHUNK_BYTES, cache: ParseCache | None = None,
+                  share_forests: bool = False, start_method: str | None = None, limits: Limits = Limits(),
+                  metrics: ParseMetrics | None = None) -> Iterator[FileResult]:
+    jobs = jobs or os.cpu_count() or 1
+    chunks = make_chunks(collect_sources(paths), jobs, chunk_bytes)
+
+    if jobs == 1:
+        for chunk in chunks:
+            for path in chunk:
+                yield parse_file(path, cache, share_forests, limits, metrics)
+
+        return
+
+    if share_forests:
+        prepare_workers()
+
+    with _pool(jobs, start_method) as executor:
+        futures = [executor.submit(_parse_chunk, chunk, cache, share_forests, limits, metrics is not None) for chunk in chunks]
+
+        for future in as_completed(futures):
+            results, snapshot, (hits, misses) = future.result()
+
+            if metrics is not None and snapshot is not None:
+                metrics.registry.merge(snapshot)
+
+            if cache is not None:
+                cache.hits += hits
+                cache.misses += misses
+
+            yield from results
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(prog="python -m calcium.batch", description="Lex and parse Calcium files in parallel.")
+    argument_parser.add_argument("paths", nargs="+", help=f"files, or directories searched for *{SOURCE_SUFFIX} files")
+    argument_parser.add_argument("-j", "--jobs", type=int, help="number of worker processes (default: number of CPUs)")
+    argument_parser.add_argument("--chunk-bytes", type=int, default=CHUNK_BYTES)
+    argument_parser.add_argument("--start-method", choices=multiprocessing.get_all_start_methods(),
+                                 help="how worker processes are started; forkserver forks them from a process with the parser preloaded")
+    argument_parser.add_argument("--max-paths", type=int, help="fail the files where a production derives more paths than this")
+    argument_parser.add_argument("--max-productions", type=int, help="fail the files that need more productions than this")
+    argument_parser.add_argument("--timeout", type=float, metavar="SECONDS", help="fail the files that take longer than this to parse")
+    argument_parser.add_argument("--max-memory", type=int, metavar="BYTES",
+                                 help="fail the files that grow the peak memory of their worker more than this")
+    argument_parser.add_argument("--timings", action="store_true", help="print the time taken by each file")
+    argument_parser.add_argument("--cache", metavar="DIRECTORY", help="reuse the results of unchanged files from this directory")
+    argument_parser.add_argument("--cache-bytes", type=int, default=CACHE_BYTES, help="size above which the cache evicts its oldest entries")
+    argument_parser.add_argument("--cache-by-terminals", action="store_true",
+                                 help="look cached results up by their terminals, ignoring whitespace and comments")
+    argument_parser.add_argument("--metrics", metavar="FILE", help="write metrics in the OpenMetrics text format to this file")
+    argument_parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                                 help="serve metrics in the OpenMetrics text format on this local port while running")
+    arguments = argument_parser.parse_args()
+
+    cache = ParseCache(arguments.cache, arguments.cache_bytes, arguments.cache_by_terminals) if arguments.cache is not None else None
+    start = time.perf_counter()
+    limits = Limits(arguments.max_paths, arguments.max_productions, arguments.timeout, arguments.max_memory)
+    metrics = ParseMetrics() if arguments.metrics is not None or arguments.metrics_port is not None else None
+    endpoint = metrics.registry.serve(arguments.metrics_port) if metrics is not None and arguments.metrics_port is not None else None
+
+    # The metrics are written even when the run fails, for the runs that need monitoring most.
+    try:
+        results = sorted(compile_files(arguments.paths, arguments.jobs, arguments.chunk_bytes, cache, start_method=arguments.start_method,
+                                       limits=limits, metrics=metrics), key=lambda result: result.path)
+        elapsed = time.perf_counter() - start
+    finally:
+        if endpoint is not None:
+            endpoint.shutdown()
+
+        if metrics is not None and arguments.metrics is not None:
+            metrics.registry.write(arguments.metrics)
+
+    errors = 0
+
+    for result in results:
+        if result.diagnostic is not None:
+            errors += 1
+            print(f"{result.path}: {result.diagnostic.kind}: {result.diagnostic.message}", file=sys.stderr)
+
+        if arguments.timings:
+            print(f"{result.seconds * 1000:10.2f} ms {result.size:10d} B  {result.path}")
+
+    hits = f", {cache.hits} of {cache.hits + cache.misses} from the cache" if cache is not None else ""
+    print(f"{len(results)} files, {errors} with errors{hits}, {elapsed:.2f}s ({len(results) / elapsed:.1f} files/s)")
+    sys.exit(1 if errors != 0 else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from array import array
+from dataclasses import dataclass
+from functools import cache
+import hashlib
+import importlib
+import os
+import struct
+import sys
+import tempfile
+from typing import Callable, Iterable
+import zlib
+
+from alchemist.front.lexer import Terminal
+
+from .diagnostics import Diagnostic
+from .fingerprint import Fingerprint, fingerprinted
+from .lexer import CalciumLexer
+
+try:
+    import fcntl
+except ImportError:  # not on POSIX
+    fcntl = None  # type: ignore[assignment]
+
+# Bumped whenever the format of the entries changes.
+CACHE_VERSION = 4
+_MAGIC = b"CACE"
+# Magic, version, then the sizes of the sections below in order, _ABSENT for a diagnostic or forest that is None.
+_HEADER = struct.Struct("<4sIIIIIII")
+_ABSENT = 0xFFFFFFFF
+CACHE_BYTES = 512 * 1024 * 1024
+# Puts between two checks of the size of the cache.
+_EVICTION_INTERVAL = 64
+
+
+# Modules whose source decides the result of a parse: the productions (generated and hand-written, with the version of
+# their generator), the lexer and its terminals, and the engine of alchemist.front running them.
+GRAMMAR_MODULES = ("calcium.parser", "calcium.lexer", "calcium.lexicon", "alchemist.front.lexer", "alchemist.front.parser")
+
+
+# Changes whenever any of GRAMMAR_MODULES changes.
+@cache
+def grammar_fingerprint() -> bytes:
+    digest = hashlib.sha256(str(CACHE_VERSION).encode())
+
+    for name in GRAMMAR_MODULES:
+        path = importlib.import_module(name).__file__
+        assert path is not None
+
+        with open(path, "rb") as file:
+            digest.update(f"{name}:".encode())
+            digest.update(hashlib.sha256(file.read()).digest())
+
+    return digest.digest()
+
+
+# Layout of an entry before compression, all integers being little-endian 32-bit unsigned: the header, the kinds as
+# UTF-8 names separated by line feeds, the terminals, the fingerprint, the kind and message of the diagnostic as UTF-8,
+# and the forest. No field is unpickled, so whoever can write to a shared cache cannot run code in its readers.
+@dataclass(slots=True)
+class CacheEntry:
+    # Names of the terminal kinds, indexed by the first of each (kind, start, end) triple of terminals.
+    kinds: tuple[str, ...]
+    terminals: array
+    # See calcium.fingerprint.
+    fingerprint: bytes
+    diagnostic: Diagnostic | None
+    # The parse result in the format of calcium.forest, when the source parsed.
+    forest: bytes | None = None
+
+    @classmethod
+    def from_terminals(cls, terminals: Iterable[Terminal], diagnostic: Diagnostic | None = None) -> "CacheEntry":
+        kinds: dict[str, int] = {}
+        triples = array("I")
+        fingerprint = Fingerprint()
+
+        for terminal in fingerprinted(terminals, fingerprint):
+            triples.extend((kinds.setdefault(type(terminal).__name__, len(kinds)), terminal.start_position, terminal.end_position))
+
+        return cls(tuple(kinds), triples, fingerprint.digest(), diagnostic)
+
+    @classmethod
+    def from_source(cls, source: str, diagnostic: Diagnostic | None = None) -> "CacheEntry":
+        return cls.from_terminals(CalciumLexer(source).terminals(), diagnostic)
+
+    def to_bytes(self) -> bytes:
+        kinds = "\n".join(self.kinds).encode()
+        terminals = array("I", self.terminals)
+        kind = self.diagnostic.kind.encode() if self.diagnostic is not None else b""
+        message = self.diagnostic.message.encode() if self.diagnostic is not None else b""
+
+        if sys.byteorder == "big":
+            terminals.byteswap()
+
+        header = _HEADER.pack(_MAGIC, CACHE_VERSION, len(kinds), len(terminals), len(self.fingerprint),
+                              len(kind) if self.diagnostic is not None else _ABSENT, len(message),
+                              len(self.forest) if self.forest is not None else _ABSENT)
+        return zlib.compress(b"".join((header, kinds, terminals.tobytes(), self.fingerprint, kind, message, self.forest or b"")))
+
+    # None for an entry of another version; ValueError for one that is not an entry.
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CacheEntry | None":
+        data = zlib.decompress(data)
+
+        if len(data) < _HEADER.size:
+            raise ValueError("truncated cache entry")
+
+        magic, version, *sizes = _HEADER.unpack_from(data)
+
+        if magic != _MAGIC:
+            raise ValueError("not a cache entry")
+
+        if version != CACHE_VERSION:
+            return None
+
+        kinds_size, terminal_count, fingerprint_size, kind_size, message_size, forest_size = sizes
+        sections = []
+        offset = _HEADER.size
+
+        for size in (kinds_size, 4 * terminal_count, fingerprint_size, kind_size, message_size, forest_size):
+            size = size if size != _ABSENT else 0
+            sections.append(data[offset:offset + size])
+            offset += size
+
+        if offset != len(data):
+            raise ValueError("size does not match the header")
+
+        kinds, terminal_bytes, fingerprint, kind, message, forest = sections
+        terminals = array("I", terminal_bytes)
+
+        if sys.byteorder == "big":
+            terminals.byteswap()
+
+        diagnostic = Diagnostic(kind.decode(), message.decode()) if kind_size != _ABSENT else None
+        return cls(tuple(kinds.decode().split("\n")) if kinds else (), terminals, fingerprint, diagnostic, forest if forest_size != _ABSENT else None)
+
+
+# Entries are files named after their key. They are written to a temporary file and renamed into place, so several
+# processes can share a cache without ever reading a partial entry. Reading an entry touches it, and the cache evicts
+# the least recently used entries once it grows over max_bytes; one process at a time does so, under a lock file.
+#
+# A cache keyed by_terminals looks entries up by the fingerprint of their terminals instead of their bytes, so that
+# reformatting and comment-only edits still hit. The positions stored in such an entry (in its terminals, diagnostic and
+# forest) are those of the source it was created from.
+#
+# hits and misses count the lookups of this instance; a copy of the cache sent to another process counts its own.
+class ParseCache:
+    def __init__(self, root: str, max_bytes: int = CACHE_BYTES, by_terminals: bool = False) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.by_terminals = by_terminals
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        os.makedirs(root, exist_ok=True)
+
+    def key(self, source: bytes) -> str:
+        return hashlib.sha256(grammar_fingerprint() + b"source:" + source).hexdigest()
+
+    def terminals_key(self, fingerprint: bytes) -> str:
+        return hashlib.sha256(grammar_fingerprint() + b"terminals:" + fingerprint).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key[2:])
+
+    # An entry that the caller cannot use (see usable) counts as a miss.
+    def get(self, key: str, usable: Callable[[CacheEntry], bool] | None = None) -> CacheEntry | None:
+        path = self._path(key)
+
+        try:
+            with open(path, "rb") as file:
+                entry = CacheEntry.from_bytes(file.read())
+
+            os.utime(path)
+        except (OSError, ValueError, zlib.error):
+            entry = None
+
+        if entry is not None and usable is not None and not usable(entry):
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return entry
+
+    def put(self, key: str, entry: CacheEntry) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".")
+
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(entry.to_bytes())
+
+            os.replace(temporary, path)
+        except OSError:
+            try:
+                os.unlink(temporary)
+            except OSError:
+                pass
+
+        self._puts += 1
+
+        if self._puts % _EVICTION_INTERVAL == 0:
+            self.evict()
+
+    def evict(self) -> None:
+        with open(os.path.join(self.root, ".lock"), "a") as lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:  # another process is evicting
+                    return
+
+            entries = []
+
+            for directory, _, names in os.walk(self.root):
+                for name in names:
+                    if not name.startswith("."):
+                        try:
+                            status = os.stat(os.path.join(directory, name))
+                        except OSError:
+                            continue
+
+                        entries.append((status.st_mtime, status.st_size, os.path.join(directory, name)))
+
+            size = sum(entry_size for _, entry_size, _ in entries)
+
+            if size <= self.max_bytes:
+                return
+
+            # Evict down to 90% of the limit, so that the next puts do not evict again right away.
+            for _, entry_size, path in sorted(entries):
+                if size <= self.max_bytes * 0.9:
+                    break
+
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+
+                size -= entry_size
@@ -0,0 +1,60 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from alchemist.front.parser import GraphNode, Production
+
+from .instrument import Observer, observing
+from .lexer import CalciumLexer
+from .parser import CalciumParser
+
+
+# Not a source error, for the same reason as calcium.limits.ParseLimitError.
+class ParseCancelledError(Exception):
+    pass
+
+
+# Set from any thread; the parse polls it on entry to every production. A plain attribute is cheaper to poll than a
+# threading.Event, and assigning it is atomic.
+class CancellationToken:
+    __slots__ = ("cancelled",)
+
+    def __init__(self) -> None:
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+class CancellationObserver(Observer):
+    def __init__(self, token: CancellationToken) -> None:
+        self.token = token
+
+    def enter(self, production: Production) -> None:
+        if self.token.cancelled:
+            raise ParseCancelledError(type(production).__name__)
+
+
+# lexer, when given, lexes source; see calcium.lexer.ReplayLexer.
+def parse_cancellable(source: str, token: CancellationToken, lexer: CalciumLexer | None = None) -> GraphNode:
+    try:
+        with observing(CancellationObserver(token)):
+            return CalciumParser(lexer if lexer is not None else CalciumLexer(source)).parse()
+    except ParseCancelledError as error:
+        production = str(error)
+
+    # Raised anew out of the except block, so that no traceback keeps the frames of the parse, and with them the partial
+    # forest, alive.
+    raise ParseCancelledError(production)
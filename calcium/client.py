@@ -0,0 +1,137 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+import base64
+from collections.abc import Iterator
+import json
+import os
+import socket
+import sys
+
+# Only the standard library is imported here, and not even typing or tempfile: the client must start faster than the
+# parse it saves.
+
+DEFAULT_SOCKET = os.path.join(os.environ.get("XDG_RUNTIME_DIR") or os.environ.get("TMPDIR") or "/tmp", f"calcium-{os.getuid()}.sock")
+
+
+class ServerError(Exception):
+    pass
+
+
+# Requests and responses are JSON objects, one per line. A request names its command and either the path of a file
+# readable by the server or the source itself; see calcium.server for the commands.
+class Client:
+    def __init__(self, path: str = DEFAULT_SOCKET) -> None:
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.connect(path)
+        self._file = self._socket.makefile("rwb")
+
+    def request(self, command: str, **fields: object) -> dict:
+        self._file.write(json.dumps({"command": command, **fields}).encode() + b"\n")
+        self._file.flush()
+        line = self._file.readline()
+
+        if not line:
+            raise ServerError("connection closed by the server")
+
+        response = json.loads(line)
+
+        if "error" in response:
+            raise ServerError(response["error"])
+
+        return response
+
+    # (kind, start, end) of the terminals, up to the diagnostic if any.
+    def lex(self, path: str | None = None, source: str | None = None) -> tuple[list[tuple[str, int, int]], dict[str, str] | None]:
+        response = self.request("lex", path=path, source=source)
+        return [(kind, start, end) for kind, start, end in response["terminals"]], response["diagnostic"]
+
+    def check(self, path: str | None = None, source: str | None = None) -> dict[str, str] | None:
+        return self.request("check", path=path, source=source)["diagnostic"]
+
+    # Forest in the format of calcium.forest, or None with the diagnostic.
+    def parse(self, path: str | None = None, source: str | None = None) -> tuple[bytes | None, dict[str, str] | None]:
+        response = self.request("parse", path=path, source=source)
+        return base64.b64decode(response["forest"]) if response["forest"] is not None else None, response["diagnostic"]
+
+    # Responses to a command over many files, tagged with their path, in the order they complete.
+    def stream(self, command: str, paths: list[str]) -> Iterator[dict]:
+        self._file.write(json.dumps({"command": command, "paths": paths}).encode() + b"\n")
+        self._file.flush()
+
+        while True:
+            line = self._file.readline()
+
+            if not line:
+                raise ServerError("connection closed by the server")
+
+            response = json.loads(line)
+
+            # A request that failed as a whole, or a stream ended early, ends with an error without a path.
+            if response.get("done") or "path" not in response:
+                if "error" in response:
+                    raise ServerError(response["error"])
+
+                return
+
+            yield response
+
+    def close(self) -> None:
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self) -> "Client":
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(prog="python -m calcium.client", description="Send requests to a running calcium.server.")
+    argument_parser.add_argument("--socket", default=DEFAULT_SOCKET)
+    argument_parser.add_argument("command", choices=("lex", "check", "parse", "ping", "metrics", "reload", "shutdown"))
+    argument_parser.add_argument("paths", nargs="*")
+    arguments = argument_parser.parse_args()
+    errors = 0
+
+    try:
+        with Client(arguments.socket) as client:
+            if arguments.command in ("ping", "metrics", "reload", "shutdown"):
+                print(json.dumps(client.request(arguments.command)))
+            elif arguments.paths:
+                for response in client.stream(arguments.command, [os.path.abspath(path) for path in arguments.paths]):
+                    path = response["path"]
+
+                    for kind, start, end in response.get("terminals", ()):
+                        print(f"{path}:{start}-{end}: {kind}")
+
+                    if "error" in response:
+                        errors += 1
+                        print(f"{path}: {response['error']}", file=sys.stderr)
+                    elif response["diagnostic"] is not None:
+                        errors += 1
+                        print(f"{path}: {response['diagnostic']['kind']}: {response['diagnostic']['message']}", file=sys.stderr)
+    except (OSError, ServerError) as error:
+        print(f"calcium.client: {error}", file=sys.stderr)
+        sys.exit(2)
+
+    sys.exit(1 if errors != 0 else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from dataclasses import dataclass
+
+from alchemist.front.lexer import CompilerEOIError
+from alchemist.front.parser import CompilerSyntaxError
+
+from .parser import CompilerNestingError
+
+# Errors of the input, as opposed to errors of the compiler.
+SOURCE_ERRORS = (CompilerSyntaxError, CompilerEOIError, CompilerNestingError)
+
+
+@dataclass(slots=True)
+class Diagnostic:
+    kind: str
+    message: str
+
+    @classmethod
+    def from_error(cls, error: Exception) -> "Diagnostic":
+        return cls(type(error).__name__, str(error))
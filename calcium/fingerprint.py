@@ -0,0 +1,56 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import hashlib
+from typing import Iterable, Iterator
+
+from alchemist.front.lexer import Terminal
+
+from .lexer import CalciumLexer
+
+
+# Canonical fingerprint of a token stream: the kind and text of each terminal, in order. The lexer already drops
+# WHITESPACES, SINGLELINE_COMMENT and MULTILINE_COMMENT, so reformatting and comment-only edits keep the fingerprint.
+class Fingerprint:
+    def __init__(self) -> None:
+        self._digest = hashlib.blake2b(digest_size=32, person=b"calcium")
+
+    def update(self, terminal: Terminal) -> None:
+        string = terminal.string.encode()
+        self._digest.update(f"{type(terminal).__name__}:{len(string)}:".encode())
+        self._digest.update(string)
+
+    def digest(self) -> bytes:
+        return self._digest.digest()
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+
+# Passes the terminals through while they are fingerprinted, so the fingerprint costs no extra pass over the source.
+def fingerprinted(terminals: Iterable[Terminal], fingerprint: Fingerprint) -> Iterator[Terminal]:
+    for terminal in terminals:
+        fingerprint.update(terminal)
+        yield terminal
+
+
+def fingerprint(source: str) -> bytes:
+    result = Fingerprint()
+
+    for terminal in CalciumLexer(source).terminals():
+        result.update(terminal)
+
+    return result.digest()
@@ -0,0 +1,239 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from array import array
+from dataclasses import dataclass
+import mmap
+import struct
+import sys
+from typing import Iterable, Iterator
+
+from alchemist.front.lexer import Terminal
+from alchemist.front.parser import GraphNode, Production
+
+# Bumped whenever the layout below changes; load refuses other versions.
+FOREST_VERSION = 1
+_MAGIC = b"CAFO"
+# Magic, version, strings, string bytes, terminals, nodes, children.
+_HEADER = struct.Struct("<4sIIIIII")
+# Token of the nodes that are not terminals.
+NO_TERMINAL = 0xFFFFFFFF
+
+# Layout, all integers being little-endian 32-bit unsigned:
+#
+#   header
+#   string offsets  strings + 1 offsets into the string bytes
+#   terminals       (kind, string, start, end) for each terminal, kind and string indexing the string table
+#   nodes           (kind, terminal) for each node, terminal being NO_TERMINAL for productions
+#   child offsets   nodes + 1 offsets into the children, the children of node i being children[offsets[i]:offsets[i + 1]]
+#   children        node indices
+#   string bytes    UTF-8
+#
+# Node 0 is the root. Nodes are shared when the forest shares them, so the format keeps ambiguities without copies.
+
+
+class FormatError(ValueError):
+    pass
+
+
+# Parsers return their start production; the forest hangs from the root node above it.
+def forest_root(node: GraphNode) -> GraphNode:
+    while node.parent is not None:
+        node = node.parent
+
+    return node
+
+
+def _terminal(node: GraphNode) -> Terminal | None:
+    return node.path if not isinstance(node, Production) and isinstance(node.path, Terminal) else None
+
+
+class _Strings:
+    def __init__(self) -> None:
+        self.indices: dict[str, int] = {}
+
+    def __call__(self, string: str) -> int:
+        return self.indices.setdefault(string, len(self.indices))
+
+
+def dump(root: GraphNode | None = None, terminals: Iterable[Terminal] = ()) -> bytes:
+    strings = _Strings()
+    terminal_indices: dict[int, int] = {}
+    terminal_array = array("I")
+
+    def add_terminal(terminal: Terminal) -> int:
+        index = terminal_indices.get(id(terminal))
+
+        if index is None:
+            index = terminal_indices[id(terminal)] = len(terminal_indices)
+            terminal_array.extend((strings(type(terminal).__name__), strings(terminal.string), terminal.start_position, terminal.end_position))
+
+        return index
+
+    for terminal in terminals:
+        add_terminal(terminal)
+
+    node_indices: dict[int, int] = {}
+    order: list[GraphNode] = []
+
+    if root is not None:
+        node_indices[id(root)] = 0
+        order.append(root)
+
+    nodes = array("I")
+    child_offsets = array("I", [0])
+    children = array("I")
+
+    # Breadth-first, so deep forests do not hit the recursion limit.
+    for node in order:
+        node_terminal = _terminal(node)
+        nodes.extend((strings(type(node_terminal or node).__name__), add_terminal(node_terminal) if node_terminal is not None else NO_TERMINAL))
+
+        for child in node.children:
+            index = node_indices.get(id(child))
+
+            if index is None:
+                index = node_indices[id(child)] = len(order)
+                order.append(child)
+
+            children.append(index)
+
+        child_offsets.append(len(children))
+
+    if root is None:
+        child_offsets = array("I")
+
+    encoded = [string.encode() for string in strings.indices]
+    string_offsets = array("I", [0])
+
+    for string in encoded:
+        string_offsets.append(string_offsets[-1] + len(string))
+
+    sections = (string_offsets, terminal_array, nodes, child_offsets, children)
+
+    if sys.byteorder == "big":
+        for section in sections:
+            section.byteswap()
+
+    header = _HEADER.pack(_MAGIC, FOREST_VERSION, len(encoded), string_offsets[-1], len(terminal_array) // 4, len(nodes) // 2, len(children))
+    return b"".join((header, *(section.tobytes() for section in sections), *encoded))
+
+
+# Terminal as read back from a Forest. It has the attributes of a Terminal, but is not one: the kind is a name.
+@dataclass(slots=True, frozen=True)
+class TerminalView:
+    kind: str
+    string: str
+    start_position: int
+    end_position: int
+
+
+# Node of a Forest, made on access. Two views of the same node compare equal.
+@dataclass(slots=True, frozen=True)
+class NodeView:
+    forest: "Forest"
+    index: int
+
+    @property
+    def kind(self) -> str:
+        return self.forest.string(self.forest.nodes[2 * self.index])
+
+    @property
+    def terminal(self) -> TerminalView | None:
+        terminal = self.forest.nodes[2 * self.index + 1]
+        return self.forest.terminal(terminal) if terminal != NO_TERMINAL else None
+
+    @property
+    def children(self) -> list["NodeView"]:
+        offsets = self.forest.child_offsets
+        return [NodeView(self.forest, child) for child in self.forest.children[offsets[self.index]:offsets[self.index + 1]]]
+
+
+# Reads the format without copying: the arrays are memoryviews over the buffer, which can be an mmap, and strings are
+# decoded once, on first use. The buffer must outlive the forest and its views.
+class Forest:
+    def __init__(self, buffer: bytes | bytearray | memoryview | mmap.mmap) -> None:
+        view = memoryview(buffer)
+
+        if len(view) < _HEADER.size:
+            raise FormatError("truncated header")
+
+        magic, version, strings, string_bytes, terminals, nodes, children = _HEADER.unpack_from(view)
+
+        if magic != _MAGIC:
+            raise FormatError("not a forest")
+
+        if version != FOREST_VERSION:
+            raise FormatError(f"version {version}, expected {FOREST_VERSION}")
+
+        sizes = (strings + 1, 4 * terminals, 2 * nodes, nodes + 1 if nodes else 0, children)
+        offset = _HEADER.size
+        sections = []
+
+        if len(view) != offset + 4 * sum(sizes) + string_bytes:
+            raise FormatError("size does not match the header")
+
+        for size in sizes:
+            section = view[offset:offset + 4 * size]
+            sections.append(section.cast("I") if sys.byteorder == "little" else memoryview(_swapped(section)))
+            offset += 4 * size
+
+        self.string_offsets, self.terminals, self.nodes, self.child_offsets, self.children = sections
+        self._string_bytes = view[offset:]
+        self._strings: list[str | None] = [None] * strings
+
+    def __len__(self) -> int:
+        return len(self.nodes) // 2
+
+    # Releases the memoryviews, after which the buffer can be closed. The forest is unusable from then on.
+    def release(self) -> None:
+        for section in (self.string_offsets, self.terminals, self.nodes, self.child_offsets, self.children, self._string_bytes):
+            section.release()
+
+    def string(self, index: int) -> str:
+        string = self._strings[index]
+
+        if string is None:
+            string = self._strings[index] = str(self._string_bytes[self.string_offsets[index]:self.string_offsets[index + 1]], "utf-8")
+
+        return string
+
+    def terminal(self, index: int) -> TerminalView:
+        kind, string, start, end = self.terminals[4 * index:4 * index + 4]
+        return TerminalView(self.string(kind), self.string(string), start, end)
+
+    def iter_terminals(self) -> Iterator[TerminalView]:
+        return (self.terminal(index) for index in range(len(self.terminals) // 4))
+
+    @property
+    def root(self) -> NodeView | None:
+        return NodeView(self, 0) if len(self) else None
+
+
+def _swapped(section: memoryview) -> array:
+    result = array("I", section.tobytes())
+    result.byteswap()
+    return result
+
+
+def load(buffer: bytes | bytearray | memoryview | mmap.mmap) -> Forest:
+    return Forest(buffer)
+
+
+# The mapping stays open as long as the forest is referenced.
+def load_file(path: str) -> Forest:
+    with open(path, "rb") as file:
+        return Forest(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
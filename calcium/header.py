@@ -0,0 +1,96 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from dataclasses import dataclass, field
+
+from alchemist.front.lexer import Terminal
+
+from .lexer import CalciumLexer
+from .lexicon import Package, Import, From, As, Comma, Semicolon
+from .stream import HEADER_TERMINALS
+
+
+@dataclass(slots=True)
+class ImportedName:
+    name: str
+    alias: str | None = None
+
+
+@dataclass(slots=True)
+class HeaderImport:
+    names: list[ImportedName] = field(default_factory=list)
+    from_name: str | None = None
+
+
+@dataclass(slots=True)
+class Header:
+    package: str | None = None
+    imports: list[HeaderImport] = field(default_factory=list)
+
+
+def _split(terminals: list[Terminal], separator: type[Terminal]) -> list[list[Terminal]]:
+    groups: list[list[Terminal]] = [[]]
+
+    for terminal in terminals:
+        if isinstance(terminal, separator):
+            groups.append([])
+        else:
+            groups[-1].append(terminal)
+
+    return groups
+
+
+# Names keep their Version, as in "calcium.io@1.0".
+def _text(terminals: list[Terminal]) -> str:
+    return "".join(terminal.string for terminal in terminals)
+
+
+def _add_declaration(header: Header, terminals: list[Terminal]) -> None:
+    first, *terminals = [terminal for terminal in terminals if not isinstance(terminal, Semicolon)]
+
+    if isinstance(first, Package):
+        header.package = _text(terminals)
+    else:
+        names, *from_name = _split(terminals, From)
+        header_import = HeaderImport(from_name=_text(from_name[0]) if len(from_name) != 0 else None)
+
+        for name in _split(names, Comma):
+            name, *alias = _split(name, As)
+            header_import.names.append(ImportedName(_text(name), _text(alias[0]) if len(alias) != 0 else None))
+
+        header.imports.append(header_import)
+
+
+# Reads PackageDeclaration and ImportDeclarations straight from the terminals and stops at the first terminal of the
+# TopLevelTypeDeclaration, without deriving any production. Syntax errors in the header are left to CalciumParser.
+def scan_header(source: str) -> Header:
+    header = Header()
+    terminals: list[Terminal] = []
+
+    for terminal in CalciumLexer(source).terminals():
+        if not isinstance(terminal, HEADER_TERMINALS) or len(terminals) == 0 and not isinstance(terminal, (Package, Import)):
+            break
+
+        if isinstance(terminal, (Package, Import)) and len(terminals) != 0:
+            _add_declaration(header, terminals)
+            terminals = []
+
+        terminals.append(terminal)
+
+    if len(terminals) != 0:
+        _add_declaration(header, terminals)
+
+    return header
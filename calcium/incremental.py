@@ -0,0 +1,314 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import bisect
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+
+from alchemist.front.parser import GraphNode, Production, Parser, CompilerSyntaxError
+from alchemist.front.lexer import CompilerEOIError, Terminal
+
+from .diagnostics import SOURCE_ERRORS
+from .lexer import CalciumLexer
+from .lexicon import (Enum, Union, Struct, Typedef, LeftParenthesis, RightParenthesis, LeftSquareBracket, RightSquareBracket, LeftCurlyBracket,
+                      RightCurlyBracket, Semicolon, Comma)
+from .lazy import INITIALIZER_PREFIXES
+from .parser import TopLevelTypeDeclaration, BodyDeclaration, EnumConstant, BodyDeclarationParser, EnumConstantParser
+from .stream import PARSERS, Token, lex, split_declarations
+
+PIECE_PARSERS: dict[type[Production], type[Parser]] = {
+    **PARSERS,
+    BodyDeclaration: BodyDeclarationParser,
+    EnumConstant: EnumConstantParser
+}
+# Stand-ins for the members when deriving the rest of a TopLevelTypeDeclaration.
+_stand_ins: dict[type[Production], str] = {
+    BodyDeclaration: "static {}",
+    EnumConstant: "x"
+}
+
+
+# Attribute set on the errors raised by parse_incremental to the span of the piece they were raised in: the first
+# declaration, or member of a declaration, that does not parse on its own.
+ERROR_SPAN = "piece_span"
+
+
+@dataclass(slots=True)
+class Edit:
+    start: int
+    end: int
+    text: str
+
+    def apply(self, source: str) -> str:
+        return source[:self.start] + self.text + source[self.end:]
+
+
+# Every piece is parsed from its own slice of the source, so the positions inside node are relative to start and do
+# not change when an edit shifts the piece. For a TopLevelTypeDeclaration split into members, node is the derivation
+# of the declaration with its members replaced by stand-ins, and the members are pieces of their own.
+@dataclass(slots=True)
+class Piece:
+    kind: type[Production]
+    start: int
+    end: int
+    node: GraphNode
+    members: list["Piece"] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class IncrementalParse:
+    source: str
+    pieces: list[Piece]
+    # Derivations by kind and source text of the pieces, reused by the next parse.
+    nodes: dict[tuple[type[Production], str], GraphNode] = field(repr=False)
+    # Tokens of the source, which the next parse lexes again only around the text that changed.
+    tokens: list[Token] = field(repr=False, default_factory=list)
+
+
+# Splits the members of a type declaration at its separators, or returns no members if that split would not be clean.
+# tokens are those of the declaration, and so are the spans of the members.
+def split_members(tokens: Iterable[Token]) -> list[tuple[type[Production], int, int]]:
+    tokens = iter(tokens)
+    keyword = None
+    previous: type[Terminal] | None = None
+
+    for terminal, _, _ in tokens:
+        previous = terminal
+
+        if issubclass(terminal, (Enum, Union, Struct, Typedef)) and keyword is None:
+            keyword = terminal
+        elif issubclass(terminal, LeftCurlyBracket):
+            break
+    else:
+        return []
+
+    # The UnionTypes of a UnionBody stay in the declaration.
+    kind: type[Production] | None = EnumConstant if keyword is Enum else None if keyword is Union else BodyDeclaration
+    members = []
+    start: int | None = None
+    end = 0
+    braces: list[bool] = []
+    depth = 0
+
+    for terminal, start_position, end_position in tokens:
+        if len(braces) == depth == 0:
+            if issubclass(terminal, RightCurlyBracket) or kind is not BodyDeclaration and issubclass(terminal, (Comma, Semicolon)):
+                # An empty member would be hidden by the stand-ins: the declaration is not split, and is parsed whole.
+                if start is None and kind is not None and (not issubclass(terminal, RightCurlyBracket) or previous is Comma):
+                    return []
+
+                if start is not None and kind is not None:
+                    members.append((kind, start, end))
+
+                if issubclass(terminal, RightCurlyBracket):
+                    break
+
+                if issubclass(terminal, Semicolon):
+                    kind = BodyDeclaration
+
+                start = None
+                previous = terminal
+                continue
+
+        if start is None:
+            start = start_position
+
+        end = end_position
+
+        if issubclass(terminal, LeftCurlyBracket):
+            braces.append(previous is not None and issubclass(previous, INITIALIZER_PREFIXES))
+        elif issubclass(terminal, RightCurlyBracket):
+            initializer = braces.pop() if len(braces) != 0 else True
+
+            if kind is BodyDeclaration and len(braces) == depth == 0 and not initializer:
+                members.append((kind, start, end))
+                start = None
+        elif issubclass(terminal, (LeftParenthesis, LeftSquareBracket)):
+            depth += 1
+        elif issubclass(terminal, (RightParenthesis, RightSquareBracket)):
+            depth = max(depth - 1, 0)
+        elif issubclass(terminal, Semicolon) and kind is BodyDeclaration and len(braces) == depth == 0:
+            members.append((kind, start, end))
+            start = None
+
+        previous = terminal
+
+    return members
+
+
+# Length of the text common to the start of both strings, then to their end after it. Compared by halves, as slices
+# compare much faster than characters one at a time.
+def _common(old: str, new: str) -> tuple[int, int]:
+    low, high = 0, min(len(old), len(new))
+
+    while low < high:
+        middle = (low + high + 1) // 2
+
+        if old[:middle] == new[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+
+    prefix = low
+    low, high = 0, min(len(old), len(new)) - prefix
+
+    while low < high:
+        middle = (low + high + 1) // 2
+
+        if old[len(old) - middle:] == new[len(new) - middle:]:
+            low = middle
+        else:
+            high = middle - 1
+
+    return prefix, low
+
+
+# Tokens of source, from those of the previous source: only the text between the nearest terminals on either side of
+# the change that are set apart from their neighbors by ignored text is lexed again, and the terminals after it are
+# shifted. None when that text does not lex back to the terminal closing it, as when the change opens a comment or a
+# string, or when it does not lex at all: only lexing the whole source tells then.
+def _relex(old: str, tokens: list[Token], source: str) -> list[Token] | None:
+    prefix, suffix = _common(old, source)
+    old_end = len(old) - suffix
+    shift = len(source) - len(old)
+    # Last terminal ending before the change with ignored text after it, and first one starting after the change with
+    # ignored text before it.
+    before = bisect.bisect_left(tokens, prefix, key=lambda token: token[2]) - 1
+
+    while 0 <= before < len(tokens) - 1 and tokens[before][2] == tokens[before + 1][1]:
+        before -= 1
+
+    after = bisect.bisect_right(tokens, old_end, key=lambda token: token[1])
+
+    while 0 < after < len(tokens) and tokens[after - 1][2] == tokens[after][1]:
+        after += 1
+
+    start = tokens[before][2] if before >= 0 else 0
+    end = tokens[after][2] + shift if after < len(tokens) else len(source)
+
+    try:
+        window = [(terminal, start_position + start, end_position + start) for terminal, start_position, end_position in lex(source[start:end])]
+    except SOURCE_ERRORS:
+        return None
+
+    if after < len(tokens):
+        terminal, start_position, end_position = tokens[after]
+
+        if len(window) == 0 or window[-1] != (terminal, start_position + shift, end_position + shift):
+            return None
+
+        if len(window) > 1 and window[-2][2] == window[-1][1]:
+            return None
+
+    return tokens[:before + 1] + window + [(terminal, start_position + shift, end_position + shift)
+                                           for terminal, start_position, end_position in tokens[after + 1:]]
+
+
+class _Parse:
+    def __init__(self, source: str, previous: IncrementalParse | None) -> None:
+        self.source = source
+        self.previous_nodes = previous.nodes if previous is not None else {}
+        self.nodes: dict[tuple[type[Production], str], GraphNode] = {}
+        tokens = None
+
+        if previous is not None:
+            tokens = previous.tokens if previous.source == source else _relex(previous.source, previous.tokens, source)
+
+        self.tokens = tokens if tokens is not None else list(lex(source))
+
+    def _node(self, kind: type[Production], text: str) -> GraphNode:
+        key = (kind, text)
+        node = self.previous_nodes.get(key)
+
+        if node is None:
+            node = self.nodes.get(key)
+
+        if node is None:
+            node = PIECE_PARSERS[kind](CalciumLexer(text)).parse()
+
+        self.nodes[key] = node
+        return node
+
+    def _type_declaration(self, start: int, end: int) -> Piece:
+        text = self.source[start:end]
+        members = split_members(self.tokens[bisect.bisect_left(self.tokens, start, key=lambda token: token[1]):])
+        # Span of the member that did not parse, which is where the declaration fails if it does not parse whole.
+        failed: tuple[int, int] | None = None
+
+        try:
+            pieces = []
+
+            for kind, member_start, member_end in members:
+                failed = member_start, member_end
+                pieces.append(Piece(kind, member_start, member_end, self._node(kind, self.source[member_start:member_end])))
+
+            failed = None
+            parts = []
+            offset = start
+
+            # Each run of members of the same kind is replaced by a single stand-in, so that the rest of the
+            # declaration keeps the same text when members are added or removed.
+            for index, (kind, member_start, member_end) in enumerate(members):
+                if index == 0 or members[index - 1][0] is not kind:
+                    parts += [self.source[offset:member_start], _stand_ins[kind]]
+
+                offset = member_end
+
+            parts.append(self.source[offset:end])
+            return Piece(TopLevelTypeDeclaration, start, end, self._node(TopLevelTypeDeclaration, "".join(parts)), pieces)
+        except SOURCE_ERRORS as error:
+            if len(members) == 0 or not isinstance(error, (CompilerSyntaxError, CompilerEOIError)):
+                setattr(error, ERROR_SPAN, failed or (start, end))
+                raise
+
+        # The members were not split as the grammar derives them: the whole declaration is the authority.
+        try:
+            return Piece(TopLevelTypeDeclaration, start, end, self._node(TopLevelTypeDeclaration, text))
+        except SOURCE_ERRORS as error:
+            setattr(error, ERROR_SPAN, failed or (start, end))
+            raise
+
+    def parse(self) -> IncrementalParse:
+        pieces = []
+
+        for kind, start, end in split_declarations(self.source, self.tokens):
+            if kind is TopLevelTypeDeclaration:
+                pieces.append(self._type_declaration(start, end))
+            else:
+                try:
+                    pieces.append(Piece(kind, start, end, self._node(kind, self.source[start:end])))
+                except SOURCE_ERRORS as error:
+                    setattr(error, ERROR_SPAN, (start, end))
+                    raise
+
+        return IncrementalParse(self.source, pieces, self.nodes, self.tokens)
+
+
+# Span of the piece error was raised in by parse_incremental, or None when it was not raised by a piece, as when the
+# source does not lex.
+def error_span(error: BaseException) -> tuple[int, int] | None:
+    return getattr(error, ERROR_SPAN, None)
+
+
+# Only the text around an edit is lexed again, and only the pieces whose text is not found in previous are derived
+# again: an edit inside a BodyDeclaration or an EnumConstant costs that member, wherever it is in the source, plus a
+# linear scan of the terminals.
+def parse_incremental(source: str, previous: IncrementalParse | None = None) -> IncrementalParse:
+    return _Parse(source, previous).parse()
+
+
+def reparse(previous: IncrementalParse, edit: Edit) -> IncrementalParse:
+    return parse_incremental(edit.apply(previous.source), previous)
@@ -0,0 +1,123 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import contextmanager
+import threading
+
+from alchemist.front.parser import Production
+
+from . import parser
+
+
+# Notified of every production derived on the thread it observes. enter is called before _derive, and leave after it
+# with the exception it raised, if any; an exception raised by enter or leave propagates out of the derivation, in place
+# of the one it raised, which is how observers abort a parse.
+class Observer:
+    def enter(self, production: Production) -> None:
+        pass
+
+    def leave(self, production: Production, error: BaseException | None) -> None:
+        pass
+
+
+_local = threading.local()
+_lock = threading.Lock()
+_users = 0
+_originals: dict[type[Production], Callable[[Production], None]] = {}
+
+
+def productions() -> list[type[Production]]:
+    return [value for value in vars(parser).values() if isinstance(value, type) and issubclass(value, Production) and "_derive" in vars(value)]
+
+
+# Leaves every observer, in reverse order, even when one raises, then raises the first exception they raised.
+def _leave(observers: Sequence[Observer], production: Production, error: BaseException | None) -> None:
+    raised: BaseException | None = None
+
+    for observer in reversed(observers):
+        try:
+            observer.leave(production, error)
+        except BaseException as leave_error:
+            if raised is None:
+                raised = leave_error
+
+    if raised is not None:
+        raise raised
+
+
+def _wrap(derive: Callable[[Production], None]) -> Callable[[Production], None]:
+    def _derive(self: Production) -> None:
+        observers = getattr(_local, "observers", ())
+
+        if not observers:
+            derive(self)
+            return
+
+        # An observer that raises on enter is not left, but the ones entered before it are, with its exception.
+        for index, observer in enumerate(observers):
+            try:
+                observer.enter(self)
+            except BaseException as error:
+                _leave(observers[:index], self, error)
+                raise
+
+        try:
+            derive(self)
+        except BaseException as error:
+            _leave(observers, self, error)
+            raise
+
+        _leave(observers, self, None)
+
+    return _derive
+
+
+# Code shared by all the wrappers, for the tools that walk frames to tell them from the methods they wrap.
+WRAPPER_CODE = _wrap(lambda production: None).__code__
+
+
+# The _derive method of every production is only wrapped while at least one thread observes, and restored afterwards,
+# so the generated code pays nothing otherwise. While wrapped, the productions of the threads that do not observe
+# pay one attribute lookup each.
+@contextmanager
+def observing(*observers: Observer) -> Iterator[None]:
+    global _users
+
+    with _lock:
+        if _users == 0:
+            for production in productions():
+                _originals[production] = vars(production)["_derive"]
+                production._derive = _wrap(_originals[production])  # type: ignore[method-assign]
+
+        _users += 1
+
+    previous = getattr(_local, "observers", ())
+    _local.observers = previous + observers
+
+    try:
+        yield
+    finally:
+        _local.observers = previous
+
+        with _lock:
+            _users -= 1
+
+            if _users == 0:
+                for production, derive in _originals.items():
+                    production._derive = derive  # type: ignore[method-assign]
+
+                _originals.clear()
@@ -0,0 +1,118 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from bisect import bisect_right
+from dataclasses import dataclass, field
+import re
+
+from alchemist.front.parser import GraphNode
+
+from .lexer import CalciumLexer
+from .lexicon import (Struct, Enum, Union, Typedef, Func, Static, LeftParenthesis, RightParenthesis, LeftSquareBracket, RightSquareBracket,
+                      LeftCurlyBracket, RightCurlyBracket, Semicolon, Comma, Equals, Colon)
+from .parser import CalciumParser, BlockParser
+
+# The first of these keywords since the start of a declaration tells what its curly brackets enclose: a Block for Func
+# (MethodBody) and Static (StaticInitializer), a body for the others. Func found later belongs to a FunctionType.
+_DECLARATION_KEYWORDS = (Struct, Enum, Union, Typedef, Func, Static)
+# A curly bracket right after one of these opens a StructInitializer.
+INITIALIZER_PREFIXES = (Equals, Colon, Comma, LeftSquareBracket)
+
+
+@dataclass(slots=True)
+class LazyBlock:
+    source: str
+    start: int
+    end: int
+    _node: GraphNode | None = field(default=None, init=False, repr=False)
+
+    # Positions inside node are relative to start.
+    @property
+    def node(self) -> GraphNode:
+        if self._node is None:
+            self._node = BlockParser(CalciumLexer(self.source[self.start:self.end])).parse()
+
+        return self._node
+
+
+@dataclass(slots=True)
+class LazyParse:
+    node: GraphNode
+    blocks: list[LazyBlock]
+
+    def block_at(self, position: int) -> LazyBlock | None:
+        index = bisect_right([block.start for block in self.blocks], position) - 1
+
+        if index >= 0 and position < self.blocks[index].end:
+            return self.blocks[index]
+
+        return None
+
+
+# Spans of the Blocks of MethodBody and StaticInitializer, found by matching curly brackets over the terminals.
+# A Block left open at the end of the input is not reported, so that its parser can report the error.
+def find_blocks(source: str) -> list[tuple[int, int]]:
+    blocks = []
+    terminals = CalciumLexer(source).terminals()
+    keyword: type | None = None
+    previous = None
+    depth = 0
+
+    for terminal in terminals:
+        if isinstance(terminal, LeftCurlyBracket):
+            if not isinstance(previous, INITIALIZER_PREFIXES) and keyword in (Func, Static):
+                start = terminal.start_position
+                nesting = 1
+
+                for inner in terminals:
+                    if isinstance(inner, LeftCurlyBracket):
+                        nesting += 1
+                    elif isinstance(inner, RightCurlyBracket):
+                        nesting -= 1
+
+                        if nesting == 0:
+                            blocks.append((start, inner.end_position))
+                            break
+
+            keyword = None
+        elif isinstance(terminal, (RightCurlyBracket, Semicolon)) or isinstance(terminal, Comma) and depth == 0:
+            keyword = None
+        elif isinstance(terminal, (LeftParenthesis, LeftSquareBracket)):
+            depth += 1
+        elif isinstance(terminal, (RightParenthesis, RightSquareBracket)):
+            depth = max(depth - 1, 0)
+        elif keyword is None and isinstance(terminal, _DECLARATION_KEYWORDS):
+            keyword = type(terminal)
+
+        previous = terminal
+
+    return blocks
+
+
+# Parses everything but the contents of the Blocks of MethodBody and StaticInitializer, which are blanked out (keeping
+# the line breaks, so that positions are unchanged) and only parsed when their node is first accessed.
+def parse_lazy(source: str) -> LazyParse:
+    spans = find_blocks(source)
+    parts = []
+    end = 0
+
+    for start, block_end in spans:
+        parts += [source[end:start + 1], re.sub(r"[^\n]", " ", source[start + 1:block_end - 1])]
+        end = block_end - 1
+
+    parts.append(source[end:])
+    skeleton = "".join(parts)
+    return LazyParse(CalciumParser(CalciumLexer(skeleton)).parse(), [LazyBlock(source, start, end) for start, end in spans])
@@ -14,7 +14,9 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from alchemist.front.lexer import Lexer
+from collections.abc import Callable, Iterator, Sequence
+
+from alchemist.front.lexer import Lexer, Terminal, CompilerEOIError
 
 from .lexicon import (
     WHITESPACES,
@@ -94,8 +96,24 @@ from .lexicon import (
 )
 
 
-class CalciumLexer(Lexer):
-    _terminals = Lexer.sort([
+# Class attribute computed on first use instead of when the module is imported, so that tools importing the lexer
+# without lexing anything do not pay for sorting the terminals.
+class _OnFirstUse:
+    def __init__(self, function: Callable[[], object]) -> None:
+        self.function = function
+        self.name = ""
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self.name = name
+
+    def __get__(self, instance: object, owner: type) -> object:
+        value = self.function()
+        setattr(owner, self.name, value)
+        return value
+
+
+def _sort_terminals() -> list:
+    return Lexer.sort([
         (
             Identifier,
             Lexer.sort([
@@ -171,4 +189,36 @@ class CalciumLexer(Lexer):
         Comma,
         At
     ])
+
+
+class CalciumLexer(Lexer):
+    _terminals = _OnFirstUse(_sort_terminals)  # type: ignore[assignment]
     _ignored = [WHITESPACES, SINGLELINE_COMMENT, MULTILINE_COMMENT]
+    # Expressions being derived one inside the other, counted by calcium.parser.Expression here, as a lexer belongs to
+    # one parse on one thread.
+    expression_depth = 0
+
+    def terminals(self) -> Iterator[Terminal]:
+        terminal: Terminal | None = None
+
+        while True:
+            try:
+                terminal = self.next_terminal(terminal)
+            except CompilerEOIError:
+                return
+
+            yield terminal
+
+
+# Lexer over the terminals already lexed from source, so that a parse after another pass over them (such as a
+# fingerprint) does not lex the source again.
+class ReplayLexer(CalciumLexer):
+    def __init__(self, source: str, terminals: Sequence[Terminal]) -> None:
+        super().__init__(source)
+        self._next: dict[Terminal | None, Terminal] = dict(zip([None, *terminals], terminals))
+
+    def next_terminal(self, terminal: Terminal | None) -> Terminal:
+        try:
+            return self._next[terminal]
+        except KeyError:  # after the last terminal
+            return super().next_terminal(terminal)
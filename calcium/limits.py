@@ -0,0 +1,102 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from dataclasses import dataclass
+import sys
+import time
+
+from alchemist.front.parser import Production
+
+from .instrument import Observer
+
+try:
+    import resource
+except ImportError:  # not on POSIX
+    resource = None  # type: ignore[assignment]
+
+# Productions derived between two checks of the deadline and the memory.
+CHECK_INTERVAL = 256
+
+
+# Every limit is off when None.
+@dataclass(slots=True, frozen=True)
+class Limits:
+    # Paths derived by a single production.
+    max_paths: int | None = None
+    max_productions: int | None = None
+    # Seconds from the start of the parse.
+    timeout: float | None = None
+    # Growth of the peak resident set size of the process during the parse, in bytes. Approximate: other threads count
+    # too, and memory the process already reached before the parse is free.
+    max_memory: int | None = None
+
+    def __bool__(self) -> bool:
+        return any(limit is not None for limit in (self.max_paths, self.max_productions, self.timeout, self.max_memory))
+
+
+# Not a source error: the grammar code catches those to try other alternatives, and must not catch this one.
+class ParseLimitError(Exception):
+    def __init__(self, limit: str, value: float, maximum: float, production: str, position: int) -> None:
+        super().__init__(f"{limit} {value:g} over {maximum:g} in {production} after position {position}")
+        self.limit = limit
+        self.value = value
+        self.maximum = maximum
+        self.production = production
+        self.position = position
+
+
+def _peak_memory() -> int:
+    if resource is None:
+        return 0
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+# Enforces limits on the parses of the thread it observes (see calcium.instrument). Start it right before the parse.
+class LimitObserver(Observer):
+    def __init__(self, limits: Limits) -> None:
+        self.limits = limits
+        self.productions = 0
+        self._start = time.monotonic()
+        self._memory = _peak_memory() if limits.max_memory is not None else 0
+
+    def _raise(self, limit: str, value: float, maximum: float, production: Production) -> None:
+        path = production.input_path.path
+        raise ParseLimitError(limit, value, maximum, type(production).__name__, path.end_position if path is not None else 0)
+
+    def enter(self, production: Production) -> None:
+        self.productions += 1
+        limits = self.limits
+
+        if limits.max_productions is not None and self.productions > limits.max_productions:
+            self._raise("productions", self.productions, limits.max_productions, production)
+
+        if self.productions % CHECK_INTERVAL != 0:
+            return
+
+        if limits.timeout is not None and (elapsed := time.monotonic() - self._start) > limits.timeout:
+            self._raise("timeout", elapsed, limits.timeout, production)
+
+        if limits.max_memory is not None and (memory := _peak_memory() - self._memory) > limits.max_memory:
+            self._raise("memory", memory, limits.max_memory, production)
+
+    def leave(self, production: Production, error: BaseException | None) -> None:
+        if error is None and self.limits.max_paths is not None:
+            paths = sum(len(nodes) for nodes in production.output_paths.values())
+
+            if paths > self.limits.max_paths:
+                self._raise("paths", paths, self.limits.max_paths, production)
@@ -0,0 +1,248 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+from dataclasses import dataclass, field
+import json
+import math
+import sys
+import threading
+import time
+from typing import Any, BinaryIO
+
+from .cancel import CancellationToken, CancellationObserver, ParseCancelledError
+from .diagnostics import SOURCE_ERRORS, Diagnostic
+from .incremental import Edit, IncrementalParse, error_span, parse_incremental
+from .instrument import observing
+
+# Seconds without edits before a document is parsed again.
+DEBOUNCE = 0.02
+# LSP TextDocumentSyncKind.Incremental and DiagnosticSeverity.Error.
+_INCREMENTAL = 2
+_ERROR = 1
+
+
+# Positions of the protocol count UTF-16 code units.
+def _units(text: str) -> int:
+    return len(text) + sum(1 for character in text if ord(character) > 0xFFFF)
+
+
+def offset(text: str, line: int, character: int) -> int:
+    start = 0
+
+    for _ in range(line):
+        start = text.find("\n", start) + 1
+
+        if start == 0:
+            return len(text)
+
+    end = text.find("\n", start)
+    end = len(text) if end == -1 else end
+    index = start
+
+    while index < end and character > 0:
+        character -= 2 if ord(text[index]) > 0xFFFF else 1
+        index += 1
+
+    return index
+
+
+def position(text: str, index: int) -> dict[str, int]:
+    line = text.count("\n", 0, index)
+    start = text.rfind("\n", 0, index) + 1
+    return {"line": line, "character": _units(text[start:index])}
+
+
+@dataclass(slots=True)
+class Document:
+    uri: str
+    text: str
+    version: int
+    # Last parse free of errors, whose derivations the next parse reuses.
+    parse: IncrementalParse | None = None
+    # Monotonic time of the next parse, if any is due.
+    due: float = math.inf
+    token: CancellationToken = field(default_factory=CancellationToken)
+
+
+# Language server over the standard streams: keeps every open document and its last parse, applies incremental
+# edits as they arrive, and publishes the diagnostics of a parse debounce seconds after the last edit. An edit
+# cancels the parse in progress of its document.
+class LanguageServer:
+    def __init__(self, input: BinaryIO, output: BinaryIO, debounce: float = DEBOUNCE) -> None:
+        self.input = input
+        self.output = output
+        self.debounce = debounce
+        self.documents: dict[str, Document] = {}
+        self._condition = threading.Condition()
+        self._output_lock = threading.Lock()
+        self._running = True
+        self._shutdown = False
+        self._thread = threading.Thread(target=self._parse_documents, name="calcium.lsp parser", daemon=True)
+
+    def _read(self) -> dict[str, Any] | None:
+        length = None
+
+        while True:
+            line = self.input.readline()
+
+            if not line:
+                return None
+
+            if line in (b"\r\n", b"\n"):
+                break
+
+            name, _, value = line.decode("ascii").partition(":")
+
+            if name.strip().lower() == "content-length":
+                length = int(value)
+
+        if length is None:
+            return None
+
+        return json.loads(self.input.read(length))
+
+    def send(self, message: dict[str, Any]) -> None:
+        body = json.dumps({"jsonrpc": "2.0", **message}).encode()
+
+        with self._output_lock:
+            self.output.write(f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+            self.output.flush()
+
+    def serve(self) -> int:
+        self._thread.start()
+
+        try:
+            while (message := self._read()) is not None:
+                if message.get("method") == "exit":
+                    return 0 if self._shutdown else 1
+
+                self._dispatch(message)
+        finally:
+            with self._condition:
+                self._running = False
+                self._condition.notify()
+
+            self._thread.join()
+
+        return 0 if self._shutdown else 1
+
+    def _dispatch(self, message: dict[str, Any]) -> None:
+        method = message.get("method")
+        params = message.get("params", {})
+
+        if method == "initialize":
+            self.send({"id": message["id"], "result": {"capabilities": {"textDocumentSync": {"openClose": True, "change": _INCREMENTAL}},
+                                                       "serverInfo": {"name": "calcium.lsp"}}})
+        elif method == "shutdown":
+            self._shutdown = True
+            self.send({"id": message["id"], "result": None})
+        elif method == "textDocument/didOpen":
+            item = params["textDocument"]
+            self._update(item["uri"], item["version"], lambda _: item["text"])
+        elif method == "textDocument/didChange":
+            item = params["textDocument"]
+            self._update(item["uri"], item["version"], lambda text: _apply(text, params["contentChanges"]))
+        elif method == "textDocument/didClose":
+            with self._condition:
+                document = self.documents.pop(params["textDocument"]["uri"], None)
+
+                if document is not None:
+                    document.token.cancel()
+
+            self.send({"method": "textDocument/publishDiagnostics", "params": {"uri": params["textDocument"]["uri"], "diagnostics": []}})
+        elif "id" in message:
+            self.send({"id": message["id"], "error": {"code": -32601, "message": f"unsupported method {method}"}})
+
+    def _update(self, uri: str, version: int, change: Any) -> None:
+        with self._condition:
+            document = self.documents.get(uri)
+
+            if document is None:
+                document = self.documents[uri] = Document(uri, "", version)
+
+            document.text = change(document.text)
+            document.version = version
+            document.token.cancel()
+            document.due = time.monotonic() + self.debounce
+            self._condition.notify()
+
+    def _parse_documents(self) -> None:
+        while True:
+            with self._condition:
+                while self._running:
+                    document = min(self.documents.values(), key=lambda document: document.due, default=None)
+                    wait = document.due - time.monotonic() if document is not None else math.inf
+
+                    if wait <= 0:
+                        break
+
+                    self._condition.wait(wait if wait != math.inf else None)
+                else:
+                    return
+
+                assert document is not None
+                document.due = math.inf
+                document.token = token = CancellationToken()
+                text, version, previous = document.text, document.version, document.parse
+
+            try:
+                with observing(CancellationObserver(token)):
+                    result = parse_incremental(text, previous)
+
+                diagnostics = []
+            except ParseCancelledError:
+                continue
+            except SOURCE_ERRORS as error:
+                result = None
+                start, end = error_span(error) or (0, len(text))
+                diagnostic = Diagnostic.from_error(error)
+                diagnostics = [{"range": {"start": position(text, start), "end": position(text, end)}, "severity": _ERROR, "source": "calcium",
+                                "message": f"{diagnostic.kind}: {diagnostic.message}"}]
+
+            with self._condition:
+                # A newer edit will publish its own diagnostics.
+                if token.cancelled:
+                    continue
+
+                if result is not None:
+                    document.parse = result
+
+            self.send({"method": "textDocument/publishDiagnostics", "params": {"uri": document.uri, "version": version, "diagnostics": diagnostics}})
+
+
+def _apply(text: str, changes: list[dict[str, Any]]) -> str:
+    for change in changes:
+        if "range" not in change:
+            text = change["text"]
+            continue
+
+        start = offset(text, change["range"]["start"]["line"], change["range"]["start"]["character"])
+        end = offset(text, change["range"]["end"]["line"], change["range"]["end"]["character"])
+        text = Edit(start, end, change["text"]).apply(text)
+
+    return text
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(prog="python -m calcium.lsp", description="Calcium language server over the standard streams.")
+    argument_parser.add_argument("--debounce", type=float, default=DEBOUNCE, help="seconds without edits before a document is parsed again")
+    arguments = argument_parser.parse_args()
+    sys.exit(LanguageServer(sys.stdin.buffer, sys.stdout.buffer, arguments.debounce).serve())
+
+
+if __name__ == "__main__":
+    main()
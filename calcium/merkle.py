@@ -0,0 +1,232 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from collections import Counter
+from dataclasses import dataclass, field
+import hashlib
+
+from alchemist.front.lexer import Terminal
+from alchemist.front.parser import Production
+
+from .fingerprint import Fingerprint
+from .instrument import Observer, observing
+from .lexer import CalciumLexer, ReplayLexer
+from .lexicon import Identifier, Struct, Enum, Union, Typedef, Func, Var, Const, LeftCurlyBracket
+from .parser import (CalciumParser, TopLevelTypeDeclaration, BodyDeclaration, StructDeclaration, EnumDeclaration, UnionDeclaration,
+                     TypedefDeclaration, FieldDeclaration, MethodDeclaration, StaticInitializer, EnumConstant)
+
+# The declarations hashed, with the keywords after which their name comes (none for EnumConstant, whose name comes
+# first, and StaticInitializer, which has none).
+DECLARATIONS: dict[type[Production], tuple[type[Terminal], ...]] = {
+    StructDeclaration: (Struct,),
+    EnumDeclaration: (Enum,),
+    UnionDeclaration: (Union,),
+    TypedefDeclaration: (Typedef,),
+    FieldDeclaration: (Var, Const),
+    MethodDeclaration: (Func,),
+    StaticInitializer: (),
+    EnumConstant: ()
+}
+# The productions wrapping a declaration with its modifiers (DeclarationEncapsulation, MemberStaticity), which belong
+# to the declaration they modify. EnumConstants have none.
+WRAPPERS = (TopLevelTypeDeclaration, BodyDeclaration)
+
+
+# Hash of a declaration computed bottom-up from the kind and text of its own terminals (those not in a member) and
+# the hashes of its members, so it changes exactly when the declaration or one of its members does. Positions are not
+# hashed: moving or reformatting a declaration keeps its hash.
+@dataclass(slots=True)
+class DeclarationHash:
+    kind: type[Production]
+    name: str | None
+    # Dotted path of names from the top-level declaration, such as "List.append". Members of the same name (such as
+    # overloads, or StaticInitializers, named after their kind) are told apart by a hash of their own terminals before
+    # their body, so that adding one does not rename the others.
+    path: str
+    digest: bytes
+    start: int
+    end: int
+    members: list["DeclarationHash"] = field(default_factory=list)
+    signature: bytes = field(default=b"", repr=False)
+
+    def walk(self) -> "list[DeclarationHash]":
+        return [self] + [declaration for member in self.members for declaration in member.walk()]
+
+
+@dataclass(slots=True)
+class Change:
+    # "added", "removed" or "changed".
+    status: str
+    path: str
+    kind: type[Production]
+
+
+# Records the span of every declaration derived, from the end of its input terminal to the end of the furthest
+# terminal it reached, and every span of the productions wrapping them.
+class DeclarationRecorder(Observer):
+    def __init__(self) -> None:
+        self.spans: dict[tuple[int, type[Production]], int] = {}
+        self.wrappers: dict[int, set[int]] = {}
+
+    def leave(self, production: Production, error: BaseException | None) -> None:
+        if error is None and (type(production) in DECLARATIONS or type(production) in WRAPPERS):
+            path = production.input_path.path
+            start = path.end_position if path is not None else 0
+
+            if type(production) in WRAPPERS:
+                for terminal in production.output_paths:
+                    self.wrappers.setdefault(terminal.end_position, set()).add(start)
+            else:
+                key = (start, type(production))
+                self.spans[key] = max(self.spans.get(key, 0), max(terminal.end_position for terminal in production.output_paths))
+
+    # The spans of the declarations derived as whole members or top-level types, starting with their modifiers. A
+    # declaration not ending where a wrapper around it does was derived by an alternative the parse did not keep.
+    def declarations(self) -> dict[tuple[int, type[Production]], int]:
+        spans = {}
+
+        for (start, kind), end in self.spans.items():
+            if kind is EnumConstant:
+                spans[(start, kind)] = end
+            else:
+                starts = [wrapper for wrapper in self.wrappers.get(end, ()) if wrapper <= start]
+
+                if len(starts) != 0:
+                    spans[(max(starts), kind)] = end
+
+        return spans
+
+
+class _Open:
+    def __init__(self, kind: type[Production], end: int) -> None:
+        self.kind = kind
+        self.end = end
+        self.start: int | None = None
+        self.name: str | None = None
+        self.named = len(DECLARATIONS[kind]) == 0
+        self.body = False
+        self.fingerprint = Fingerprint()
+        self.signature = Fingerprint()
+        self.members: list[DeclarationHash] = []
+
+    def add(self, terminal: Terminal) -> None:
+        if self.start is None:
+            self.start = terminal.start_position
+
+        self.fingerprint.update(terminal)
+
+        if isinstance(terminal, LeftCurlyBracket):
+            self.body = True
+        elif not self.body:
+            self.signature.update(terminal)
+
+            if isinstance(terminal, DECLARATIONS[self.kind]):
+                self.named = True
+            elif self.named and self.name is None and isinstance(terminal, Identifier) and self.kind is not StaticInitializer:
+                self.name = terminal.string
+
+    def close(self, end: int) -> DeclarationHash:
+        digest = hashlib.blake2b(f"{self.kind.__name__}:".encode() + self.fingerprint.digest(), digest_size=32, person=b"calcium")
+
+        for member in self.members:
+            digest.update(member.digest)
+
+        return DeclarationHash(self.kind, self.name, "", digest.digest(), self.start if self.start is not None else end, end, self.members,
+                               self.signature.digest())
+
+
+# One pass over the terminals: each one is fingerprinted into the innermost declaration spanning it, and a declaration
+# is hashed as soon as it ends. Spans crossing the end of an enclosing one were derived by alternatives the parse did
+# not keep, and are skipped.
+def _hash_spans(spans: dict[tuple[int, type[Production]], int], terminals: list[Terminal]) -> list[DeclarationHash]:
+    ordered = sorted(((start, -end, kind) for (start, kind), end in spans.items()), key=lambda span: span[:2])
+    roots: list[DeclarationHash] = []
+    stack: list[_Open] = []
+    index = 0
+
+    def close(end: int) -> None:
+        declaration = stack.pop().close(end)
+        (stack[-1].members if stack else roots).append(declaration)
+
+    for terminal in terminals:
+        while stack and stack[-1].end <= terminal.start_position:
+            close(stack[-1].end)
+
+        while index < len(ordered) and ordered[index][0] <= terminal.start_position:
+            _, end, kind = ordered[index]
+            index += 1
+
+            if -end > terminal.start_position and (not stack or -end <= stack[-1].end):
+                stack.append(_Open(kind, -end))
+
+        if stack:
+            stack[-1].add(terminal)
+
+    while stack:
+        close(stack[-1].end)
+
+    return roots
+
+
+def _assign_paths(declaration: DeclarationHash, path: str) -> None:
+    declaration.path = path
+    labels = [member.name or member.kind.__name__ for member in declaration.members]
+    counts = Counter(labels)
+    seen: Counter[str] = Counter()
+
+    for label, member in zip(labels, declaration.members):
+        if counts[label] > 1:
+            label += f"[{member.signature.hex()[:12]}]"
+            seen[label] += 1
+
+            if seen[label] > 1:
+                label += f"#{seen[label] - 1}"
+
+        _assign_paths(member, f"{path}.{label}")
+
+
+# Parses source once, recording the declarations derived, and hashes them in a single pass over its terminals. Returns
+# the hash of the TopLevelTypeDeclaration.
+def hash_declarations(source: str) -> DeclarationHash:
+    terminals = list(CalciumLexer(source).terminals())
+    recorder = DeclarationRecorder()
+
+    with observing(recorder):
+        CalciumParser(ReplayLexer(source, terminals)).parse()
+
+    root = _hash_spans(recorder.declarations(), terminals)[-1]
+    _assign_paths(root, root.name or root.kind.__name__)
+    return root
+
+
+def diff(old: DeclarationHash | str, new: DeclarationHash | str) -> list[Change]:
+    if not isinstance(old, DeclarationHash):
+        old = hash_declarations(old)
+
+    if not isinstance(new, DeclarationHash):
+        new = hash_declarations(new)
+
+    old_declarations = {declaration.path: declaration for declaration in old.walk()}
+    new_declarations = {declaration.path: declaration for declaration in new.walk()}
+    changes = [Change("removed", path, declaration.kind) for path, declaration in old_declarations.items() if path not in new_declarations]
+
+    for path, declaration in new_declarations.items():
+        if path not in old_declarations:
+            changes.append(Change("added", path, declaration.kind))
+        elif old_declarations[path].digest != declaration.digest:
+            changes.append(Change("changed", path, declaration.kind))
+
+    return changes
@@ -0,0 +1,218 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import bisect
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import math
+import os
+import tempfile
+import threading
+from typing import Any
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+# Seconds, for parse latencies.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = tuple[tuple[str, str], ...]
+
+# The umask can only be read by setting it, which is done once, on import, rather than from the threads writing.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+_ESCAPES = str.maketrans({"\\": "\\\\", '"': '\\"', "\n": "\\n"})
+
+
+def _labels(labels: Labels) -> str:
+    return "{" + ",".join(f'{name}="{value.translate(_ESCAPES)}"' for name, value in labels) + "}" if labels else ""
+
+
+def _number(value: float) -> str:
+    return "+Inf" if value == math.inf else repr(int(value)) if float(value).is_integer() else repr(value)
+
+
+# Metrics are safe to update from several threads. Across processes, each process updates its own registry, and the
+# parent merges the snapshots of the others into its own; see calcium.batch.
+class Counter:
+    def __init__(self, name: str, help: str) -> None:
+        self.name = name
+        self.help = help
+        self._values: dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(sorted(labels.items())), 0.0)
+
+    def snapshot(self) -> Any:
+        with self._lock:
+            return dict(self._values)
+
+    def merge(self, snapshot: Any) -> None:
+        with self._lock:
+            for key, value in snapshot.items():
+                self._values[key] = self._values.get(key, 0.0) + value
+
+    def render(self) -> list[str]:
+        lines = [f"# TYPE {self.name} counter", f"# HELP {self.name} {self.help}"]
+
+        for key, value in sorted(self.snapshot().items()):
+            lines.append(f"{self.name}_total{_labels(key)} {_number(value)}")
+
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # Observations per bucket, not cumulative, then their count and sum.
+        self._counts = [0] * len(self.buckets)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self) -> Any:
+        with self._lock:
+            return list(self._counts), self._sum
+
+    def merge(self, snapshot: Any) -> None:
+        counts, total = snapshot
+
+        with self._lock:
+            for index, count in enumerate(counts):
+                self._counts[index] += count
+
+            self._sum += total
+
+    def render(self) -> list[str]:
+        counts, total = self.snapshot()
+        lines = [f"# TYPE {self.name} histogram", f"# HELP {self.name} {self.help}"]
+        cumulative = 0
+
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            # Bounds are written as floats even when whole, as OpenMetrics requires of the le label.
+            lines.append(f'{self.name}_bucket{{le="{"+Inf" if bound == math.inf else repr(float(bound))}"}} {cumulative}')
+
+        lines += [f"{self.name}_count {cumulative}", f"{self.name}_sum {_number(total)}"]
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: dict[str, Counter | Histogram] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help: str) -> Counter:
+        with self._lock:
+            metric = self.metrics.setdefault(name, Counter(name, help))
+
+        assert isinstance(metric, Counter)
+        return metric
+
+    def histogram(self, name: str, help: str, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        with self._lock:
+            metric = self.metrics.setdefault(name, Histogram(name, help, buckets))
+
+        assert isinstance(metric, Histogram)
+        return metric
+
+    # Picklable state of the metrics, for merge in another process.
+    def snapshot(self) -> dict[str, Any]:
+        return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+    # Adds to this registry the metrics of a snapshot taken from a registry with the same metrics.
+    def merge(self, snapshot: dict[str, Any]) -> None:
+        for name, state in snapshot.items():
+            self.metrics[name].merge(state)
+
+    def render(self) -> str:
+        return "".join(f"{line}\n" for metric in self.metrics.values() for line in metric.render()) + "# EOF\n"
+
+    # Replaces the file in one step, for collectors reading it at any time.
+    def write(self, path: str) -> None:
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".")
+
+        try:
+            with os.fdopen(descriptor, "w", encoding="utf-8") as file:
+                # mkstemp creates the file readable by its owner only: it gets the mode open would have created it with.
+                os.fchmod(file.fileno(), 0o666 & ~_UMASK)
+                file.write(self.render())
+
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    # Serves the metrics on every path of a local HTTP endpoint, from a daemon thread, until shutdown is called on the
+    # server returned.
+    def serve(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="calcium.metrics", daemon=True).start()
+        return server
+
+
+# The metrics of lexing and parsing files, as recorded by calcium.batch.
+class ParseMetrics:
+    def __init__(self, registry: Registry | None = None) -> None:
+        self.registry = registry if registry is not None else Registry()
+        self.files = self.registry.counter("calcium_files", "Files parsed, by result.")
+        self.source_bytes = self.registry.counter("calcium_source_bytes", "Bytes of the files read, lexed or not.")
+        self.tokens = self.registry.counter("calcium_tokens", "Terminals of the files lexed or found in the cache.")
+        self.failures = self.registry.counter("calcium_failures", "Files that failed to lex or parse, by error kind.")
+        self.cache_lookups = self.registry.counter("calcium_cache_lookups", "Parse cache lookups, by result.")
+        self.latency = self.registry.histogram("calcium_parse_seconds", "Time taken to read, lex and parse a file.")
+
+    # tokens is None when the file failed to lex.
+    def record(self, size: int, tokens: int | None, seconds: float, error: str | None) -> None:
+        self.files.inc(result="ok" if error is None else "error")
+        self.source_bytes.inc(size)
+        self.latency.observe(seconds)
+
+        if tokens is not None:
+            self.tokens.inc(tokens)
+
+        if error is not None:
+            self.failures.inc(kind=error)
+
+    def cache_lookup(self, hit: bool) -> None:
+        self.cache_lookups.inc(result="hit" if hit else "miss")
@@ -14,8 +14,6 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from typing import cast, TYPE_CHECKING
-
 from alchemist.front.lexer import CompilerEOIError
 from alchemist.front.parser import Paths, GraphNode, Production, Parser, CompilerSyntaxError, CompilerNoPathError
 
@@ -71,8 +69,8 @@ from .lexicon import (
     _Uint,
     _Ulong,
     _Ushort,
-    BlockStatement,
-    Expression,
+    BlockStatement as BlockStatementTerminal,
+    Expression as ExpressionTerminal,
     Integer,
     LeftSquareBracket,
     RightSquareBracket,
@@ -92,57 +90,91 @@ from .lexicon import (
     At
 )
 
+# Importing typing takes longer than the rest of this module, and cast is all of it the productions need at run time.
+TYPE_CHECKING = False
+
 if TYPE_CHECKING:
+    from typing import cast
+
     from alchemist.front.lexer import Terminal
 
+    from .lexer import CalciumLexer
+else:
+    def cast(_: object, value: object) -> object:
+        return value
+
 # [[[cog
 # __name__ = "calcium.parser"
 #
 # import cog
 #
-# from .syntax import (CompilationUnit, PackageDeclaration, ImportDeclarations, TopLevelTypeDeclaration, ImportDeclaration, DeclarationEncapsulation,
-#                      TypeDeclaration, ImportNames, FromName, PackageName, ImportName, PackageOrTypeName, TypedefDeclaration, EnumDeclaration,
-#                      UnionDeclaration, StructDeclaration, Version, BaseType, TypedefBody, EnumLayout, EnumBody, UnionBody,
-#                      DeclarationExtensibility, StructSeal, StructLayout, StructBody, BodyDeclarations, EnumConstants, UnionTypes, TypeNames,
-#                      BodyDeclaration, EnumConstant, StaticInitializer, MemberDeclaration, VariableInitializer, SymbolNaming, MemberStaticity,
-#                      FieldDeclaration, MethodDeclaration, MethodOverride, MethodHeader, MethodBody, MethodDeclarator, Parameters, FixedParameters,
-#                      VariableArityParameter, FixedParameter, Type, PrimitiveType, PointerOrArraySuffix, TypeName, VoidPointerType, FunctionType,
-#                      PointerNullity, TypeAtomicity, NumericType, PointerSuffix, ArrayDim, TypeStrictness, ParameterTypes, TypeBareness,
-#                      FunctionStrictness, FunctionPurity, Result, IntegralType, FloatingPointType, ValueMutability, ValueVolatility, PointerWidth,
-#                      ReferenceAliasability, ThisParameter, FixedParameterTypes, VariableArityParameterType, FixedParameterType,
-#                      VariableArityParameterLayout, Block, BlockStatements, ArrayInitializer, StructInitializer, VariableInitializers,
-#                      FieldInitializers, FieldInitializer)
+# from .syntax import (PackageDeclaration, TopLevelTypeDeclaration, ImportDeclaration, DeclarationEncapsulation, ImportNames, FromName, PackageName,
+#                      ImportName, PackageOrTypeName, TypedefDeclaration, EnumDeclaration, UnionDeclaration, StructDeclaration, Version, BaseType,
+#                      TypedefBody, EnumLayout, EnumBody, UnionBody, DeclarationExtensibility, StructSeal, StructLayout, StructBody, BodyDeclarations,
+#                      EnumConstants, UnionTypes, TypeNames, BodyDeclaration, EnumConstant, StaticInitializer, MemberDeclaration, VariableInitializer,
+#                      SymbolNaming, MemberStaticity, FieldDeclaration, MethodDeclaration, MethodOverride, MethodHeader, MethodBody, MethodDeclarator,
+#                      Parameters, FixedParameters, VariableArityParameter, FixedParameter, Type, PrimitiveType, PointerOrArraySuffix, TypeName,
+#                      VoidPointerType, FunctionType, PointerNullity, TypeAtomicity, NumericType, PointerSuffix, ArrayDim, TypeStrictness,
+#                      ParameterTypes, TypeBareness, FunctionStrictness, FunctionPurity, Result, IntegralType, FloatingPointType, ValueMutability,
+#                      ValueVolatility, PointerWidth, ReferenceAliasability, ThisParameter, FixedParameterTypes, VariableArityParameterType,
+#                      FixedParameterType, VariableArityParameterLayout, Block, BlockStatements, ArrayInitializer, StructInitializer,
+#                      VariableInitializers, FieldInitializers, FieldInitializer)
 # ]]]
 # [[[end]]]
 
+# Commit points: once a decisive keyword (Package, Import, Typedef, Enum, Union or Struct) is the next terminal of a path,
+# no sibling alternative can succeed from that same path anymore. CompilationUnit, ImportDeclarations and TypeDeclaration
+# are hand-written so that they commit such a path to the one alternative its keyword starts, without deriving the others
+# from it or carrying it (and the older terminals it references) until the end of the production.
+
+
+class CommittingProduction(Production):
+    # Commits the paths followed by keyword to symbol and returns where they end; the other paths are left in paths. A
+    # committed path that fails to derive symbol is dropped.
+    def _commit_paths(self, paths: Paths, keyword: type["Terminal"], symbol: type[Production]) -> Paths:
+        new_paths: Paths = {}
+
+        for path in list(paths):
+            try:
+                if not isinstance(self.lexer.next_terminal(path), keyword):
+                    continue
+            except CompilerEOIError:
+                continue
+
+            try:
+                GraphNode.merge_paths(new_paths, self._process_paths({path: paths.pop(path)}, symbol))
+            except (CompilerSyntaxError, CompilerEOIError):
+                pass
+
+        if len(new_paths) == 0:
+            raise CompilerNoPathError(self)
+
+        return new_paths
+
+
 # Packages
 
 
-# [[[cog
-# cog.out(CompilationUnit.generate())
-# ]]]
-class CompilationUnit(Production):
+class CompilationUnit(CommittingProduction):
     def _derive(self) -> None:
         input_path = cast(GraphNode, self.input_path)
         paths0: Paths = {cast("Terminal", input_path.path): {input_path}}
 
-        try:  # optional
-            paths1 = paths0
-            paths1 = self._process_paths(paths1, PackageDeclaration)
+        try:  # optional, commit at Package
+            paths1 = self._commit_paths(paths0, Package, PackageDeclaration)
             GraphNode.merge_paths(paths0, paths1)
         except (CompilerSyntaxError, CompilerEOIError):
             pass
 
-        try:  # optional
-            paths1 = paths0
-            paths1 = self._process_paths(paths1, ImportDeclarations)
+        try:  # optional, commit at Import
+            paths1 = self._commit_paths(paths0, Import, ImportDeclarations)
             GraphNode.merge_paths(paths0, paths1)
         except (CompilerSyntaxError, CompilerEOIError):
             pass
 
         paths0 = self._process_paths(paths0, TopLevelTypeDeclaration)
         self.output_paths = paths0
-# [[[end]]]
+
 
 ###
 
@@ -168,26 +200,27 @@ class PackageDeclaration(Production):
 # [[[end]]]
 
 
-# [[[cog
-# cog.out(ImportDeclarations.generate())
-# ]]]
-class ImportDeclarations(Production):
+# Hand-written, see CommittingProduction.
+
+
+class ImportDeclarations(CommittingProduction):
     def _derive(self) -> None:
         input_path = cast(GraphNode, self.input_path)
         paths0: Paths = {cast("Terminal", input_path.path): {input_path}}
-        paths0 = self._process_paths(paths0, ImportDeclaration)
-
-        paths1 = paths0
+        paths1 = self._process_paths(paths0, ImportDeclaration)
+        paths0 = {}
 
-        while True:  # repeat
+        while True:  # repeat, commit at Import
             try:
-                paths1 = self._process_paths(paths1, ImportDeclaration)
-                GraphNode.merge_paths(paths0, paths1)
+                paths2 = self._commit_paths(paths1, Import, ImportDeclaration)
             except (CompilerSyntaxError, CompilerEOIError):
                 break
+            finally:
+                GraphNode.merge_paths(paths0, paths1)
+
+            paths1 = paths2
 
         self.output_paths = paths0
-# [[[end]]]
 
 
 # [[[cog
@@ -282,44 +315,29 @@ class DeclarationEncapsulation(Production):
 # [[[end]]]
 
 
-# [[[cog
-# cog.out(TypeDeclaration.generate())
-# ]]]
+# Hand-written, see the commit points above. The decisive keyword of each option may follow modifiers (as in
+# "final sealed struct"), so it is looked up ahead of each path, up to the body of the declaration; see
+# TYPE_DECLARATIONS.
+
+
 class TypeDeclaration(Production):
     def _derive(self) -> None:
         input_path = cast(GraphNode, self.input_path)
         paths0: Paths = {cast("Terminal", input_path.path): {input_path}}
 
-        # begin oneof
+        # begin oneof, commit at Typedef, Enum, Union or Struct
         paths1: Paths = {}
 
-        try:  # option 1
-            paths2 = paths0
-            paths2 = self._process_paths(paths2, TypedefDeclaration)
-            GraphNode.merge_paths(paths1, paths2)
-        except (CompilerSyntaxError, CompilerEOIError):
-            pass
-
-        try:  # option 2
-            paths2 = paths0
-            paths2 = self._process_paths(paths2, EnumDeclaration)
-            GraphNode.merge_paths(paths1, paths2)
-        except (CompilerSyntaxError, CompilerEOIError):
-            pass
+        for path, nodes in paths0.items():
+            option = self._option(cast("Terminal", path))
 
-        try:  # option 3
-            paths2 = paths0
-            paths2 = self._process_paths(paths2, UnionDeclaration)
-            GraphNode.merge_paths(paths1, paths2)
-        except (CompilerSyntaxError, CompilerEOIError):
-            pass
+            if option is None:
+                continue
 
-        try:  # option 4
-            paths2 = paths0
-            paths2 = self._process_paths(paths2, StructDeclaration)
-            GraphNode.merge_paths(paths1, paths2)
-        except (CompilerSyntaxError, CompilerEOIError):
-            pass
+            try:
+                GraphNode.merge_paths(paths1, self._process_paths({path: nodes}, option))
+            except (CompilerSyntaxError, CompilerEOIError):
+                pass
 
         if len(paths1) == 0:
             raise CompilerNoPathError(self)
@@ -328,7 +346,20 @@ class TypeDeclaration(Production):
         # end oneof
 
         self.output_paths = paths0
-# [[[end]]]
+
+    def _option(self, terminal: "Terminal | None") -> type[Production] | None:
+        while True:
+            try:
+                terminal = self.lexer.next_terminal(terminal)
+            except CompilerEOIError:
+                return None
+
+            if type(terminal) in TYPE_DECLARATIONS:
+                return TYPE_DECLARATIONS[type(terminal)]
+
+            if isinstance(terminal, (LeftCurlyBracket, Semicolon)):
+                return None
+
 
 ###
 
@@ -3068,8 +3099,211 @@ class BlockStatements(Production):
         self.output_paths = paths0
 # [[[end]]]
 
+# BlockStatement and Expression are hand-written productions that replace the placeholder terminals of the same names
+# wherever the generated productions use them.
+
+
+class BlockStatement(Production):
+    def _derive(self) -> None:
+        input_path = cast(GraphNode, self.input_path)
+        paths0: Paths = {cast("Terminal", input_path.path): {input_path}}
+
+        # begin oneof, commit after the first option found
+        paths1: Paths = {}
+
+        for option in (BlockStatementTerminal, Semicolon, Block, ExpressionStatement):
+            try:
+                paths1 = self._process_paths(paths0, option)
+                break
+            except (CompilerSyntaxError, CompilerEOIError):
+                pass
+
+        if len(paths1) == 0:
+            raise CompilerNoPathError(self)
+
+        paths0 = paths1
+        # end oneof
+
+        self.output_paths = paths0
+
+###
+
+
+class ExpressionStatement(Production):
+    def _derive(self) -> None:
+        input_path = cast(GraphNode, self.input_path)
+        paths0: Paths = {cast("Terminal", input_path.path): {input_path}}
+        paths0 = self._process_paths(paths0, Expression)
+
+        try:  # optional
+            paths1 = paths0
+            paths1 = self._process_paths(paths1, Equals)
+            paths1 = self._process_paths(paths1, Expression)
+            GraphNode.merge_paths(paths0, paths1)
+        except (CompilerSyntaxError, CompilerEOIError):
+            pass
+
+        paths0 = self._process_paths(paths0, Semicolon)
+        self.output_paths = paths0
+
 # Expressions
 
+# Expressions are derived by precedence climbing (Pratt parsing) instead of by a generated grammar: each operator is
+# tried once per position and only the longest derivation is kept, so operator precedence never multiplies the paths.
+# The operand on the right of an operator is a child production that only takes operators binding more tightly, which
+# gives the derivation its precedence structure.
+#
+# Every operand nested in parentheses, brackets, arguments or on the right of an operator is derived a few Python frames
+# deeper, so nesting is bounded: past MAX_EXPRESSION_DEPTH levels within the outermost expression, the parse fails with a
+# CompilerNestingError rather than running out of stack. C requires of its compilers 63 levels of parentheses.
+MAX_EXPRESSION_DEPTH = 64
+
+
+# An error of the input, like the syntax errors, but not one: the grammar code catches those to try other alternatives,
+# and the parse must stop at the first of these instead.
+class CompilerNestingError(Exception):
+    pass
+
+
+class Expression(Production):
+    _power = 0
+
+    def _derive(self) -> None:
+        lexer = cast("CalciumLexer", self.lexer)
+        input_path = cast(GraphNode, self.input_path)
+
+        if lexer.expression_depth > MAX_EXPRESSION_DEPTH:
+            position = input_path.path.end_position if input_path.path is not None else 0
+            raise CompilerNestingError(f"expressions nested deeper than {MAX_EXPRESSION_DEPTH} levels after position {position}")
+
+        lexer.expression_depth += 1
+
+        try:
+            paths0: Paths = {cast("Terminal", input_path.path): {input_path}}
+            paths0 = self._process_prefix(paths0)
+
+            while True:  # repeat
+                try:
+                    paths0 = self._process_operator(paths0)
+                except (CompilerSyntaxError, CompilerEOIError):
+                    break
+
+            self.output_paths = paths0
+        finally:
+            lexer.expression_depth -= 1
+
+    def _process_prefix(self, paths: Paths) -> Paths:
+        for operator, power in PREFIX_OPERATORS.items():
+            try:
+                paths1 = self._process_paths(paths, operator)
+            except (CompilerSyntaxError, CompilerEOIError):
+                continue
+
+            return self._process_paths(paths1, OPERANDS[power])
+
+        for primary in PRIMARY_EXPRESSIONS:
+            try:
+                return self._process_paths(paths, primary)
+            except (CompilerSyntaxError, CompilerEOIError):
+                pass
+
+        paths = self._process_paths(paths, LeftParenthesis)
+        paths = self._process_paths(paths, Expression)
+        return self._process_paths(paths, RightParenthesis)
+
+    def _process_operator(self, paths: Paths) -> Paths:
+        for operator, (left_power, right_power, separator) in INFIX_OPERATORS.items():
+            if left_power <= self._power:
+                continue
+
+            try:
+                paths1 = self._process_paths(paths, operator)
+            except (CompilerSyntaxError, CompilerEOIError):
+                continue
+
+            if separator is not None:
+                paths1 = self._process_paths(paths1, Expression)
+                paths1 = self._process_paths(paths1, separator)
+
+            return self._process_paths(paths1, OPERANDS[right_power])
+
+        for operator, (left_power, operand, closing, optional) in POSTFIX_OPERATORS.items():
+            if left_power <= self._power:
+                continue
+
+            try:
+                paths1 = self._process_paths(paths, operator)
+            except (CompilerSyntaxError, CompilerEOIError):
+                continue
+
+            if not optional:
+                paths1 = self._process_paths(paths1, operand)
+            else:
+                try:  # optional
+                    paths2 = paths1
+                    paths2 = self._process_paths(paths2, operand)
+                    GraphNode.merge_paths(paths1, paths2)
+                except (CompilerSyntaxError, CompilerEOIError):
+                    pass
+
+            if closing is not None:
+                paths1 = self._process_paths(paths1, closing)
+
+            return paths1
+
+        raise CompilerNoPathError(self)
+
+
+class Arguments(Production):
+    def _derive(self) -> None:
+        input_path = cast(GraphNode, self.input_path)
+        paths0: Paths = {cast("Terminal", input_path.path): {input_path}}
+        paths0 = self._process_paths(paths0, Expression)
+
+        paths1 = paths0
+
+        while True:  # repeat
+            try:
+                paths1 = self._process_paths(paths1, Comma)
+                paths1 = self._process_paths(paths1, Expression)
+                GraphNode.merge_paths(paths0, paths1)
+            except (CompilerSyntaxError, CompilerEOIError):
+                break
+
+        self.output_paths = paths0
+
+
+# Binding powers of the operators: prefix operators -> power of their operand; infix operators -> (left power, right
+# power, separator preceded by a nested Expression, if any); postfix operators -> (left power, operand, terminal
+# closing the operand, if any, whether the operand is optional). Infix operators are right-associative when their right
+# power is the lower one.
+PRIMARY_EXPRESSIONS: "tuple[type[Terminal], ...]" = (ExpressionTerminal, Identifier, Integer, This)
+PREFIX_OPERATORS: "dict[type[Terminal], int]" = {
+    Ampersand: 13
+}
+INFIX_OPERATORS: "dict[type[Terminal], tuple[int, int, type[Terminal] | None]]" = {
+    Question: (2, 1, Colon)
+}
+POSTFIX_OPERATORS: "dict[type[Terminal], tuple[int, type[Terminal | Production], type[Terminal] | None, bool]]" = {
+    FullStop: (15, Identifier, None, False),
+    HyphenGreaterThan: (15, Identifier, None, False),
+    LeftParenthesis: (15, Arguments, RightParenthesis, True),
+    LeftSquareBracket: (15, Expression, RightSquareBracket, False)
+}
+
+
+# Operand of the operators whose operand binds with power. Each one is bound to this module under its name, so that
+# derivations containing it can be pickled.
+def _operand(power: int) -> type[Expression]:
+    operand = type(f"Operand{power}", (Expression,), {"_power": power})
+    globals()[operand.__name__] = operand
+    return operand
+
+
+OPERANDS: dict[int, type[Expression]] = {
+    power: _operand(power) for power in sorted({*PREFIX_OPERATORS.values(), *(right_power for _, right_power, _ in INFIX_OPERATORS.values())})
+}
+
 # Array and Struct Initializers
 
 
@@ -3228,5 +3462,41 @@ class FieldInitializer(Production):
 # [[[end]]]
 
 
+# The option of TypeDeclaration that each decisive keyword commits to.
+TYPE_DECLARATIONS: "dict[type[Terminal], type[Production]]" = {
+    Typedef: TypedefDeclaration,
+    Enum: EnumDeclaration,
+    Union: UnionDeclaration,
+    Struct: StructDeclaration
+}
+
+
 class CalciumParser(Parser):
     _start = CompilationUnit
+
+
+# Entry points for the top-level declarations of a CompilationUnit, used to parse them one at a time.
+
+
+class PackageDeclarationParser(Parser):
+    _start = PackageDeclaration
+
+
+class ImportDeclarationParser(Parser):
+    _start = ImportDeclaration
+
+
+class TopLevelTypeDeclarationParser(Parser):
+    _start = TopLevelTypeDeclaration
+
+
+class BlockParser(Parser):
+    _start = Block
+
+
+class BodyDeclarationParser(Parser):
+    _start = BodyDeclaration
+
+
+class EnumConstantParser(Parser):
+    _start = EnumConstant
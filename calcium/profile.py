@@ -0,0 +1,132 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+from dataclasses import asdict, dataclass, field
+import json
+import sys
+import time
+
+from alchemist.front.parser import Production
+
+from .diagnostics import SOURCE_ERRORS, Diagnostic
+from .instrument import Observer, observing
+from .lexer import CalciumLexer
+from .parser import CalciumParser
+
+
+@dataclass(slots=True)
+class ProductionStats:
+    calls: int = 0
+    successes: int = 0
+    failures: int = 0
+    # Every call derives from a single input path; these are the paths it derived, over all calls.
+    output_paths: int = 0
+    max_output_paths: int = 0
+    # Cumulative time only counts the outermost call of a recursive production, as in cProfile.
+    cumulative_seconds: float = 0.0
+    self_seconds: float = 0.0
+    exceptions: dict[str, int] = field(default_factory=dict)
+
+
+class ProductionProfiler(Observer):
+    def __init__(self) -> None:
+        self.stats: dict[str, ProductionStats] = {}
+        # (stats, start, time spent in children) of the productions being derived.
+        self._stack: list[tuple[ProductionStats, float, list[float]]] = []
+        self._depths: dict[str, int] = {}
+
+    def enter(self, production: Production) -> None:
+        name = type(production).__name__
+        stats = self.stats.get(name)
+
+        if stats is None:
+            stats = self.stats[name] = ProductionStats()
+
+        stats.calls += 1
+        self._depths[name] = self._depths.get(name, 0) + 1
+        self._stack.append((stats, time.perf_counter(), [0.0]))
+
+    def leave(self, production: Production, error: BaseException | None) -> None:
+        stats, start, children = self._stack.pop()
+        elapsed = time.perf_counter() - start
+        name = type(production).__name__
+        self._depths[name] -= 1
+        stats.self_seconds += elapsed - children[0]
+
+        if self._depths[name] == 0:
+            stats.cumulative_seconds += elapsed
+
+        if self._stack:
+            self._stack[-1][2][0] += elapsed
+
+        if error is None:
+            paths = sum(len(nodes) for nodes in production.output_paths.values())
+            stats.successes += 1
+            stats.output_paths += paths
+            stats.max_output_paths = max(stats.max_output_paths, paths)
+        else:
+            stats.failures += 1
+            kind = type(error).__name__
+            stats.exceptions[kind] = stats.exceptions.get(kind, 0) + 1
+
+    def table(self, sort: str = "self_seconds", limit: int | None = None) -> str:
+        rows = sorted(self.stats.items(), key=lambda item: getattr(item[1], sort), reverse=True)[:limit]
+        width = max((len(name) for name, _ in rows), default=10)
+        lines = [f"{'production':<{width}} {'calls':>9} {'ok':>9} {'failed':>9} {'paths':>9} {'max':>6} {'cumul ms':>10} {'self ms':>10}"]
+
+        for name, stats in rows:
+            lines.append(f"{name:<{width}} {stats.calls:9d} {stats.successes:9d} {stats.failures:9d} {stats.output_paths:9d} "
+                         f"{stats.max_output_paths:6d} {stats.cumulative_seconds * 1000:10.2f} {stats.self_seconds * 1000:10.2f}")
+
+        return "\n".join(lines)
+
+    def to_json(self) -> str:
+        return json.dumps({name: asdict(stats) for name, stats in self.stats.items()}, indent=2)
+
+
+def profile_parse(source: str) -> tuple[ProductionProfiler, Diagnostic | None]:
+    profiler = ProductionProfiler()
+
+    with observing(profiler):
+        try:
+            CalciumParser(CalciumLexer(source)).parse()
+        except SOURCE_ERRORS as error:
+            return profiler, Diagnostic.from_error(error)
+
+    return profiler, None
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(prog="python -m calcium.profile", description="Time and count the productions derived by a parse.")
+    argument_parser.add_argument("path")
+    argument_parser.add_argument("--json", action="store_true")
+    argument_parser.add_argument("--sort", default="self_seconds", choices=[name for name in ProductionStats.__slots__ if name != "exceptions"])
+    argument_parser.add_argument("--limit", type=int, default=30)
+    arguments = argument_parser.parse_args()
+
+    with open(arguments.path, encoding="utf-8") as file:
+        profiler, diagnostic = profile_parse(file.read())
+
+    print(profiler.to_json() if arguments.json else profiler.table(arguments.sort, arguments.limit))
+
+    if diagnostic is not None:
+        print(f"{arguments.path}: {diagnostic.kind}: {diagnostic.message}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,497 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+import base64
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+import importlib.util
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import socket
+import socketserver
+import statistics
+import sys
+import threading
+import time
+from types import ModuleType
+from typing import Any, Iterator
+
+from . import lexer as lexer_module, parser as parser_module
+from .aio import BATCH_DELAY, BATCH_SIZE, run_batch
+from .client import DEFAULT_SOCKET
+from .diagnostics import SOURCE_ERRORS, Diagnostic
+from .forest import dump, forest_root
+from .warm import warm_up
+
+# Modules reloaded, in this order, when one of their files changes.
+_GRAMMAR_MODULES = (lexer_module, parser_module)
+# Prefix of the private names the reloaded modules are loaded under.
+_RELOADED = "calcium._reloaded_"
+# Latencies kept for the percentiles of the metrics command.
+_LATENCIES = 4096
+
+
+def _mtimes() -> tuple[float, ...]:
+    return tuple(os.stat(module.__file__).st_mtime for module in _GRAMMAR_MODULES)
+
+
+# The lexer and parser classes in use. A reload loads the grammar into new module objects, so a request keeps the
+# grammar it started with, and a reload never changes the classes under a parse in progress.
+@dataclass(slots=True, frozen=True)
+class _Grammar:
+    lexer: type[lexer_module.CalciumLexer]
+    replay: type[lexer_module.ReplayLexer]
+    parser: type[parser_module.CalciumParser]
+    mtimes: tuple[float, ...]
+
+    @classmethod
+    def from_modules(cls, modules: dict[str, ModuleType], mtimes: tuple[float, ...]) -> "_Grammar":
+        return cls(modules["lexer"].CalciumLexer, modules["lexer"].ReplayLexer, modules["parser"].CalciumParser, mtimes)
+
+
+# Executes the files of the grammar modules anew, into modules of their own under private names, leaving the modules
+# imported by the rest of the package, and the classes of the requests in progress, untouched.
+def _load_grammar() -> dict[str, ModuleType]:
+    modules: dict[str, ModuleType] = {}
+
+    for module in _GRAMMAR_MODULES:
+        name = module.__name__.rpartition(".")[2]
+        spec = importlib.util.spec_from_file_location(_RELOADED + name, module.__file__)
+        assert spec is not None and spec.loader is not None
+        modules[name] = importlib.util.module_from_spec(spec)
+        # Registered, as dataclasses and pickle look classes up by the name of their module; the next reload replaces it.
+        sys.modules[spec.name] = modules[name]
+        spec.loader.exec_module(modules[name])
+
+    return modules
+
+
+# Gathers the requests of all connections into batches for a pool of worker processes. Workers are spawned rather than
+# forked, so that the pool started on a reload imports the new grammar, and warm up with calcium.warm when they start.
+class _Dispatcher:
+    def __init__(self, workers: int, batch_size: int, batch_delay: float) -> None:
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.batches = 0
+        self.batched = 0
+        self._queue: queue.Queue[tuple[str, str, Future] | None] = queue.Queue()
+        # Requests of the jobs submitted to the executor, until they complete.
+        self._jobs: dict[Future, int] = {}
+        self._jobs_lock = threading.Lock()
+        self._executor = self._start()
+        self._thread = threading.Thread(target=self._run, name="calcium.server dispatcher", daemon=True)
+        self._thread.start()
+
+    def _start(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(self.workers, multiprocessing.get_context("spawn"), warm_up)
+
+    # Requests not started yet: those waiting to be batched, and those of the jobs the executor has not handed to a worker.
+    @property
+    def depth(self) -> int:
+        with self._jobs_lock:
+            waiting = sum(requests for job, requests in self._jobs.items() if not job.running() and not job.done())
+
+        return self._queue.qsize() + waiting
+
+    def submit(self, command: str, source: str) -> Future:
+        future: Future = Future()
+        self._queue.put((command, source, future))
+        return future
+
+    def _run(self) -> None:
+        while (item := self._queue.get()) is not None:
+            batch = [item]
+            deadline = time.monotonic() + self.batch_delay
+
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+
+                if item is None:
+                    self._queue.put(None)
+                    break
+
+                batch.append(item)
+
+            self.batches += 1
+            self.batched += len(batch)
+
+            for command in {command for command, _, _ in batch}:
+                requests = [(source, future) for other, source, future in batch if other == command]
+
+                try:
+                    job = self._submit(command, [source for source, _ in requests])
+                except Exception as error:
+                    for _, future in requests:
+                        future.set_exception(error)
+
+                    continue
+
+                with self._jobs_lock:
+                    self._jobs[job] = len(requests)
+
+                job.add_done_callback(lambda job, requests=requests: self._done(requests, job))
+
+    # An executor shut down by a reload since it was read, or broken by a worker that died, raises RuntimeError; the job
+    # then goes to the executor started in its place, starting one if it is the broken one.
+    def _submit(self, command: str, sources: list[str]) -> Future:
+        executor = self._executor
+
+        try:
+            return executor.submit(run_batch, command, sources, None)
+        except RuntimeError:
+            if executor is self._executor:
+                self.restart()
+
+            return self._executor.submit(run_batch, command, sources, None)
+
+    def _done(self, requests: list[tuple[str, Future]], job: Future) -> None:
+        with self._jobs_lock:
+            self._jobs.pop(job, None)
+
+        _deliver(requests, job)
+
+    def restart(self) -> None:
+        executor = self._executor
+        self._executor = self._start()
+        executor.shutdown(wait=False)
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+        self._executor.shutdown()
+
+
+def _deliver(requests: list[tuple[str, Future]], job: Future) -> None:
+    if job.exception() is not None:
+        for _, future in requests:
+            future.set_exception(job.exception())  # type: ignore[arg-type]
+    else:
+        for (_, future), result in zip(requests, job.result()):
+            future.set_result(result)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: "CompileServer"
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                responses = self.server.handle_request_object(request)
+            except Exception as error:
+                responses = {"error": f"{type(error).__name__}: {error}"}
+
+            try:
+                for response in [responses] if isinstance(responses, dict) else responses:
+                    self.wfile.write(json.dumps(response).encode() + b"\n")
+                    self.wfile.flush()
+            except Exception as error:
+                self.wfile.write(json.dumps({"error": f"{type(error).__name__}: {error}"}).encode() + b"\n")
+                self.wfile.flush()
+
+
+# Serves the commands of calcium.client over a Unix domain socket, one thread per connection. Without workers, parsing
+# holds the GIL, so threads overlap the reading of files and sockets, not the parses themselves. With workers, the
+# lex, check and parse requests of all connections are batched to a pool of that many processes.
+#
+# Commands:
+#
+#   lex       terminals as (kind, start, end) triples, and the diagnostic of the lexer if any
+#   check     diagnostic of the parse
+#   parse     diagnostic, or the forest in the format of calcium.forest, base64-encoded
+#   ping      process id of the server
+#   metrics   requests served, queue depth, batching and latency percentiles
+#   reload    reloads the grammar now
+#   shutdown  stops accepting connections, then waits for the open ones
+#
+# lex, check and parse take the path of a file, its source, or a list of paths. With a list, a response tagged with its
+# path is streamed as each file completes, followed by {"done": true}, which carries an error if the stream ended early.
+#
+# Before each command, the server reloads calcium.lexer and calcium.parser if their files changed.
+class CompileServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = False
+    block_on_close = True
+
+    def __init__(self, path: str = DEFAULT_SOCKET, workers: int = 0, batch_size: int = BATCH_SIZE, batch_delay: float = BATCH_DELAY) -> None:
+        self._reload_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self.grammar = _Grammar.from_modules({"lexer": lexer_module, "parser": parser_module}, _mtimes())
+        self.requests = 0
+        self.reloads = 0
+        self.in_flight = 0
+        self.latencies: deque[float] = deque(maxlen=_LATENCIES)
+        self._dispatcher = _Dispatcher(workers, batch_size, batch_delay) if workers > 0 else None
+        _remove_stale_socket(path)
+        mask = os.umask(0o077)
+
+        try:
+            super().__init__(path, _Handler)
+        finally:
+            os.umask(mask)
+
+    def reload(self, force: bool = False) -> _Grammar:
+        with self._reload_lock:
+            mtimes = _mtimes()
+
+            if force or mtimes != self.grammar.mtimes:
+                try:
+                    modules = _load_grammar()
+                except Exception as error:
+                    # Keep serving the previous grammar until the files change again.
+                    print(f"calcium.server: reload failed, keeping the previous grammar: {error!r}", file=sys.stderr)
+                    self.grammar = _Grammar(self.grammar.lexer, self.grammar.replay, self.grammar.parser, mtimes)
+                else:
+                    self.grammar = _Grammar.from_modules(modules, mtimes)
+                    self.reloads += 1
+
+                    if self._dispatcher is not None:
+                        self._dispatcher.restart()
+
+            return self.grammar
+
+    def _current_grammar(self) -> _Grammar:
+        grammar = self.grammar
+        return grammar if _mtimes() == grammar.mtimes else self.reload()
+
+    def metrics(self) -> dict[str, Any]:
+        with self._metrics_lock:
+            latencies = sorted(self.latencies)
+
+        metrics: dict[str, Any] = {"requests": self.requests, "in_flight": self.in_flight, "reloads": self.reloads}
+
+        if latencies:
+            metrics["latency_ms"] = {"p50": latencies[len(latencies) // 2] * 1000, "p99": latencies[len(latencies) * 99 // 100] * 1000,
+                                     "mean": statistics.fmean(latencies) * 1000}
+
+        if self._dispatcher is not None:
+            metrics["queue_depth"] = self._dispatcher.depth
+            metrics["batches"] = self._dispatcher.batches
+            metrics["mean_batch"] = self._dispatcher.batched / self._dispatcher.batches if self._dispatcher.batches else 0.0
+
+        return metrics
+
+    def handle_request_object(self, request: dict[str, Any]) -> dict[str, Any] | Iterator[dict[str, Any]]:
+        command = request["command"]
+
+        with self._metrics_lock:
+            self.requests += 1
+
+        if command == "ping":
+            return {"pid": os.getpid(), "requests": self.requests, "reloads": self.reloads}
+
+        if command == "metrics":
+            return self.metrics()
+
+        if command == "reload":
+            self.reload(force=True)
+            return {"reloads": self.reloads}
+
+        if command == "shutdown":
+            # shutdown waits for serve_forever, which waits for this handler.
+            threading.Thread(target=self.shutdown).start()
+            return {}
+
+        if command not in ("lex", "check", "parse"):
+            raise ValueError(f"unknown command {command!r}")
+
+        if request.get("paths") is not None:
+            return self._stream(command, request["paths"])
+
+        if request.get("source") is not None:
+            source = request["source"]
+        else:
+            source = _read(request["path"])
+
+        return self._timed(command, source).result()
+
+    # Ends with {"done": true} whatever happens, with the error that ended the stream early if any.
+    def _stream(self, command: str, paths: list[str]) -> Iterator[dict[str, Any]]:
+        futures: dict[Future, str] = {}
+        done: dict[str, Any] = {"done": True}
+
+        try:
+            for path in paths:
+                try:
+                    future = self._timed(command, _read(path))
+                except (ValueError, OSError) as error:
+                    yield {"path": path, "error": f"{type(error).__name__}: {error}"}
+                    continue
+
+                # Without workers, the file was parsed by _timed: its response is streamed before the next one is.
+                if self._dispatcher is None:
+                    yield _streamed(path, future)
+                else:
+                    futures[future] = path
+
+            for future in as_completed(futures):
+                yield _streamed(futures[future], future)
+        except Exception as error:
+            done["error"] = f"{type(error).__name__}: {error}"
+
+        yield done
+
+    # Future of the response to a lex, check or parse command, which completes right away without workers.
+    def _timed(self, command: str, source: str) -> Future:
+        start = time.perf_counter()
+        grammar = self._current_grammar()
+
+        with self._metrics_lock:
+            self.in_flight += 1
+
+        if self._dispatcher is not None:
+            future = self._dispatcher.submit(command, source)
+        else:
+            future = Future()
+
+            try:
+                future.set_result(_run_inline(grammar, command, source))
+            except Exception as error:
+                future.set_exception(error)
+
+        response: Future = Future()
+
+        def done(future: Future) -> None:
+            with self._metrics_lock:
+                self.in_flight -= 1
+                self.latencies.append(time.perf_counter() - start)
+
+            try:
+                response.set_result(_response(command, future.result()))
+            except Exception as error:
+                response.set_exception(error)
+
+        future.add_done_callback(done)
+        return response
+
+    def server_close(self) -> None:
+        super().server_close()
+
+        if self._dispatcher is not None:
+            self._dispatcher.close()
+
+
+# Result of a lex, check or parse command in the shape of calcium.aio.run_batch.
+def _run_inline(grammar: _Grammar, command: str, source: str) -> object:
+    if command == "lex":
+        terminals: list[tuple[str, int, int]] = []
+
+        try:
+            for terminal in grammar.lexer(source).terminals():
+                terminals.append((type(terminal).__name__, terminal.start_position, terminal.end_position))
+        except SOURCE_ERRORS as error:
+            return terminals, Diagnostic.from_error(error)
+
+        return terminals, None
+
+    # The forest is parsed from the terminals it is dumped with, so that its nodes share them.
+    try:
+        replayed = list(grammar.lexer(source).terminals()) if command == "parse" else None
+        node = grammar.parser(grammar.replay(source, replayed) if replayed is not None else grammar.lexer(source)).parse()
+    except SOURCE_ERRORS as error:
+        return (None, Diagnostic.from_error(error)) if command == "parse" else Diagnostic.from_error(error)
+
+    if replayed is None:
+        return None
+
+    return dump(forest_root(node), replayed), None
+
+
+# Response to one of the paths of a stream, from the future of _timed.
+def _streamed(path: str, future: Future) -> dict[str, Any]:
+    try:
+        response = future.result()
+    except Exception as error:
+        response = {"error": f"{type(error).__name__}: {error}"}
+
+    return {"path": path, **response}
+
+
+def _read(path: str) -> str:
+    with open(path, encoding="utf-8") as file:
+        return file.read()
+
+
+def _diagnostic(diagnostic: Diagnostic | None) -> dict[str, str] | None:
+    return {"kind": diagnostic.kind, "message": diagnostic.message} if diagnostic is not None else None
+
+
+# Response to a lex, check or parse command from the result of calcium.aio.run_batch.
+def _response(command: str, result: Any) -> dict[str, Any]:
+    if command == "lex":
+        terminals, diagnostic = result
+        return {"terminals": terminals, "diagnostic": _diagnostic(diagnostic)}
+
+    if command == "check":
+        return {"diagnostic": _diagnostic(result)}
+
+    forest, diagnostic = result
+    return {"forest": base64.b64encode(forest).decode("ascii") if forest is not None else None, "diagnostic": _diagnostic(diagnostic)}
+
+
+# A socket left behind by a server that died is removed; one that still answers belongs to a running server.
+def _remove_stale_socket(path: str) -> None:
+    if not os.path.exists(path):
+        return
+
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        probe.connect(path)
+    except OSError:
+        os.unlink(path)
+    else:
+        raise OSError(f"a server is already listening on {path}")
+    finally:
+        probe.close()
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(prog="python -m calcium.server",
+                                              description="Keep the lexer and parser loaded and serve calcium.client requests.")
+    argument_parser.add_argument("--socket", default=DEFAULT_SOCKET)
+    argument_parser.add_argument("-j", "--workers", type=int, default=0, help="parse in this many worker processes (default: in the server)")
+    argument_parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="requests sent to a worker at once")
+    argument_parser.add_argument("--batch-delay", type=float, default=BATCH_DELAY, help="seconds a request waits for others to batch with")
+    arguments = argument_parser.parse_args()
+
+    try:
+        server = CompileServer(arguments.socket, arguments.workers, arguments.batch_size, arguments.batch_delay)
+    except OSError as error:
+        print(f"calcium.server: {error}", file=sys.stderr)
+        sys.exit(1)
+
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+
+    try:
+        with server:
+            server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        os.unlink(arguments.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
+import os
+
+from .forest import Forest
+
+
+# Name and size of a shared memory segment holding a forest in the format of calcium.forest. The size is kept apart
+# because some platforms round segments up to whole pages.
+@dataclass(slots=True, frozen=True)
+class SharedForestRef:
+    name: str
+    size: int
+
+
+# Lifetime of a segment:
+#
+# - share copies the data into a new segment and closes its own handle, so the segment outlives the worker.
+# - From then on, whoever receives the reference owns the segment, and must either open it with SharedForest and close
+#   that, or drop it with release. Both unlink the segment.
+# - A segment still linked when the program ends is unlinked by the resource tracker of multiprocessing, with a warning
+#   about leaked shared_memory objects. Workers must therefore report to the tracker of the parent, not to their own,
+#   which would unlink their segments as soon as they exit; see prepare_workers.
+def share(data: bytes) -> SharedForestRef:
+    segment = shared_memory.SharedMemory(create=True, size=len(data))
+
+    try:
+        segment.buf[:len(data)] = data
+    except BaseException:
+        segment.close()
+        segment.unlink()
+        raise
+
+    segment.close()
+    return SharedForestRef(segment.name, len(data))
+
+
+# Starts the resource tracker of this process, for the workers started afterwards to share it. Forked workers only
+# inherit a tracker that is already running; spawned ones are always handed the one of their parent.
+def prepare_workers() -> None:
+    if os.name == "posix":
+        resource_tracker.ensure_running()
+
+
+def release(ref: SharedForestRef) -> None:
+    segment = shared_memory.SharedMemory(ref.name)
+    segment.close()
+    segment.unlink()
+
+
+# Forest read in place from a segment. The forest, and any view made from it, must not be used after close.
+class SharedForest:
+    def __init__(self, ref: SharedForestRef) -> None:
+        segment = shared_memory.SharedMemory(ref.name)
+
+        try:
+            self.forest = Forest(segment.buf[:ref.size])
+        except BaseException:
+            segment.close()
+            raise
+
+        self._segment: shared_memory.SharedMemory | None = segment
+
+    def close(self) -> None:
+        if self._segment is None:
+            return
+
+        self.forest.release()
+        self._segment.close()
+        self._segment.unlink()
+        self._segment = None
+
+    def __enter__(self) -> Forest:
+        return self.forest
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
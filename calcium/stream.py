@@ -0,0 +1,102 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from dataclasses import dataclass
+import re
+from typing import Iterable, Iterator
+
+from alchemist.front.lexer import Terminal
+from alchemist.front.parser import GraphNode, Production, Parser
+
+from .lexer import CalciumLexer
+from .lexicon import Package, Import, From, As, Identifier, FullStop, Comma, At, Integer, Semicolon
+from .parser import (PackageDeclaration, ImportDeclaration, TopLevelTypeDeclaration, CalciumParser, PackageDeclarationParser,
+                     ImportDeclarationParser, TopLevelTypeDeclarationParser)
+
+# Only these terminals can appear in PackageDeclaration and ImportDeclarations, and Package and Import can only start
+# a new declaration. The first terminal outside of this set therefore starts the TopLevelTypeDeclaration.
+HEADER_TERMINALS = (Package, Import, From, As, Identifier, FullStop, Comma, At, Integer, Semicolon)
+
+PARSERS: dict[type[Production], type[Parser]] = {
+    PackageDeclaration: PackageDeclarationParser,
+    ImportDeclaration: ImportDeclarationParser,
+    TopLevelTypeDeclaration: TopLevelTypeDeclarationParser
+}
+
+# Kind of a terminal, and its span in the source: all that splitting the source needs, and what calcium.incremental
+# keeps of the terminals between two parses.
+Token = tuple[type[Terminal], int, int]
+
+
+def lex(source: str) -> Iterator[Token]:
+    for terminal in CalciumLexer(source).terminals():
+        yield type(terminal), terminal.start_position, terminal.end_position
+
+
+@dataclass(slots=True)
+class Declaration:
+    kind: type[Production]
+    start: int
+    end: int
+    node: GraphNode
+
+
+# The declarations follow CompilationUnit: at most one PackageDeclaration, first, then the ImportDeclarations. A Package
+# anywhere else is rejected with the error of the full parser. tokens, when given, are those of source.
+def split_declarations(source: str, tokens: Iterable[Token] | None = None) -> Iterator[tuple[type[Production], int, int]]:
+    kind: type[Production] | None = None
+    start = 0
+
+    for terminal, start_position, _ in tokens if tokens is not None else lex(source):
+        if issubclass(terminal, (Package, Import)):
+            if kind is not None:
+                if issubclass(terminal, Package):
+                    _reject(source)
+
+                yield kind, start, start_position
+
+            kind = PackageDeclaration if issubclass(terminal, Package) else ImportDeclaration
+            start = start_position
+        elif kind is None or not issubclass(terminal, HEADER_TERMINALS):
+            if kind is not None:
+                yield kind, start, start_position
+
+            yield TopLevelTypeDeclaration, start_position, len(source)
+            return
+
+    if kind is not None:
+        yield kind, start, len(source)
+
+    # A missing TopLevelTypeDeclaration is reported by its parser.
+    yield TopLevelTypeDeclaration, len(source), len(source)
+
+
+def _reject(source: str) -> None:
+    CalciumParser(CalciumLexer(source)).parse()
+    raise AssertionError("CompilationUnit accepted a PackageDeclaration after another declaration")
+
+
+# Each declaration is parsed from its own slice of the source, after the source before it blanked out (keeping the line
+# breaks), so that the positions in node and in errors are those of the source. The slices all start in the header.
+def parse_declaration(source: str, kind: type[Production], start: int, end: int) -> Declaration:
+    return Declaration(kind, start, end, PARSERS[kind](CalciumLexer(re.sub(r"[^\n]", " ", source[:start]) + source[start:end])).parse())
+
+
+# Yields the PackageDeclaration, each ImportDeclaration and the TopLevelTypeDeclaration as soon as the terminal starting
+# the next one has been lexed. Nothing is kept once a declaration has been yielded.
+def parse_declarations(source: str) -> Iterator[Declaration]:
+    for kind, start, end in split_declarations(source):
+        yield parse_declaration(source, kind, start, end)
@@ -0,0 +1,177 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+from contextlib import AbstractContextManager
+import json
+import sys
+import threading
+import time
+from types import FrameType, TracebackType
+
+from alchemist.front.parser import Production
+
+from .diagnostics import SOURCE_ERRORS, Diagnostic
+from .instrument import WRAPPER_CODE, Observer, observing
+from .lexer import CalciumLexer
+from .parser import CalciumParser
+
+# Stacks of production names, outermost first, with their weight: microseconds of self time when traced, samples when
+# sampled.
+Stacks = dict[tuple[str, ...], int]
+
+
+def collapsed(stacks: Stacks) -> str:
+    return "".join(f"{';'.join(stack)} {weight}\n" for stack, weight in sorted(stacks.items()))
+
+
+# Sampled profile in the file format of https://www.speedscope.app, which keeps no order between the stacks.
+def speedscope(stacks: Stacks, name: str, unit: str) -> str:
+    frames: dict[str, int] = {}
+    samples = [[frames.setdefault(frame, len(frames)) for frame in stack] for stack in stacks]
+    weights = list(stacks.values())
+    return json.dumps({
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": [{"name": frame} for frame in frames]},
+        "profiles": [{"type": "sampled", "name": name, "unit": unit, "startValue": 0, "endValue": sum(weights), "samples": samples,
+                      "weights": weights}],
+        "name": name,
+        "exporter": "calcium.trace"
+    })
+
+
+# Exact: records the self time of every production under the stack of productions deriving it. Costs a hook on every
+# derivation; see Sampler for large inputs.
+class Tracer(Observer):
+    unit = "microseconds"
+
+    def __init__(self) -> None:
+        self.stacks: Stacks = {}
+        self._names: list[str] = []
+        # Start and time spent in children of the productions being derived.
+        self._times: list[list[float]] = []
+        # Created on each entry, so that a tracer can be entered again once exited.
+        self._observing: AbstractContextManager[None] | None = None
+
+    def enter(self, production: Production) -> None:
+        self._names.append(type(production).__name__)
+        self._times.append([time.perf_counter(), 0.0])
+
+    def leave(self, production: Production, error: BaseException | None) -> None:
+        start, children = self._times.pop()
+        elapsed = time.perf_counter() - start
+        stack = tuple(self._names)
+        self._names.pop()
+        self.stacks[stack] = self.stacks.get(stack, 0) + round((elapsed - children) * 1_000_000)
+
+        if self._times:
+            self._times[-1][1] += elapsed
+
+    def __enter__(self) -> "Tracer":
+        self._observing = observing(self)
+        self._observing.__enter__()
+        return self
+
+    def __exit__(self, exception_type: type[BaseException] | None, exception: BaseException | None, traceback: TracebackType | None) -> None:
+        assert self._observing is not None
+        context, self._observing = self._observing, None
+        context.__exit__(exception_type, exception, traceback)
+
+
+# Statistical: a background thread looks at the frames of the parsing thread every interval and counts the stack of
+# productions it finds. The parse itself runs unmodified.
+class Sampler:
+    unit = "none"
+
+    def __init__(self, interval: float = 0.001, thread_id: int | None = None) -> None:
+        self.interval = interval
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.stacks: Stacks = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _stack(self, frame: FrameType | None) -> tuple[str, ...]:
+        names = []
+
+        while frame is not None:
+            if frame.f_code.co_name == "_derive" and frame.f_code is not WRAPPER_CODE:
+                production = frame.f_locals.get("self")
+
+                if isinstance(production, Production):
+                    names.append(type(production).__name__)
+
+            frame = frame.f_back
+
+        return tuple(reversed(names))
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            stack = self._stack(sys._current_frames().get(self.thread_id))
+
+            if stack:
+                self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+    def __enter__(self) -> "Sampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def trace_parse(source: str, interval: float | None = None) -> tuple[Tracer | Sampler, Diagnostic | None]:
+    profiler = Sampler(interval) if interval is not None else Tracer()
+
+    with profiler:
+        try:
+            CalciumParser(CalciumLexer(source)).parse()
+        except SOURCE_ERRORS as error:
+            return profiler, Diagnostic.from_error(error)
+
+    return profiler, None
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(prog="python -m calcium.trace", description="Record the stacks of productions derived by a parse.")
+    argument_parser.add_argument("path")
+    argument_parser.add_argument("--format", choices=("collapsed", "speedscope"), default="collapsed")
+    argument_parser.add_argument("--sample", type=float, metavar="SECONDS",
+                                 help="sample the stack at this interval instead of tracing every production")
+    argument_parser.add_argument("-o", "--output", help="file written instead of the standard output")
+    arguments = argument_parser.parse_args()
+
+    with open(arguments.path, encoding="utf-8") as file:
+        profiler, diagnostic = trace_parse(file.read(), arguments.sample)
+
+    if arguments.format == "collapsed":
+        output = collapsed(profiler.stacks)
+    else:
+        output = speedscope(profiler.stacks, arguments.path, profiler.unit)
+
+    if arguments.output is not None:
+        with open(arguments.output, "w", encoding="utf-8") as file:
+            file.write(output)
+    else:
+        sys.stdout.write(output)
+
+    if diagnostic is not None:
+        print(f"{arguments.path}: {diagnostic.kind}: {diagnostic.message}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
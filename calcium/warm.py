@@ -0,0 +1,42 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from .cache import grammar_fingerprint
+from .lexer import CalciumLexer
+from .parser import CalciumParser
+
+# Exercises every kind of member, so that whatever the lexer and parser build on first use is built here.
+WARM_UP_SOURCE = """package warm.up;
+import Dep, Helper as H from warm.dep;
+
+public struct WarmUp {
+    var field: int = Expression;
+    func method(x: int) -> int {
+        BlockStatement
+    }
+    static {
+        BlockStatement
+    }
+}
+"""
+
+
+# Called by the pools of calcium.batch and calcium.server, in the parent or the fork server (see calcium._preload) before
+# forking workers so that they share its state copy-on-write, or else in each worker as it starts. Importing this module
+# does not warm up.
+def warm_up() -> None:
+    CalciumParser(CalciumLexer(WARM_UP_SOURCE)).parse()
+    grammar_fingerprint()
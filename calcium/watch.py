@@ -0,0 +1,183 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+import os
+import sys
+import time
+
+from .batch import SOURCE_SUFFIX
+from .diagnostics import SOURCE_ERRORS, Diagnostic
+from .incremental import IncrementalParse, parse_incremental
+
+# Seconds between two polls of the files.
+INTERVAL = 0.2
+
+
+@dataclass(slots=True)
+class WatchedFile:
+    # (st_mtime_ns, st_size) when last parsed, or None while the file cannot be stat'd.
+    stamp: tuple[int, int] | None
+    # Last parse free of errors, whose derivations the next parse reuses.
+    parse: IncrementalParse | None
+    diagnostic: Diagnostic | None
+
+
+@dataclass(slots=True)
+class Change:
+    path: str
+    # None for a file that parses, or was removed.
+    diagnostic: Diagnostic | None
+    seconds: float
+    removed: bool = False
+
+
+def _stamp(status: os.stat_result) -> tuple[int, int]:
+    return status.st_mtime_ns, status.st_size
+
+
+# Polls the files under some paths and reparses those that changed, keeping every parse in memory. Directories are
+# listed again only when their own modification time changes, so a poll costs a stat per file and directory. Symbolic
+# links to directories are not followed, as with calcium.batch, which also keeps link cycles from being walked.
+class Watcher:
+    def __init__(self, paths: Iterable[str]) -> None:
+        self.roots = list(paths)
+        self.files: dict[str, WatchedFile] = {}
+        self._directories: dict[str, int] = {}
+
+    def _scan(self, directory: str) -> Iterator[str]:
+        try:
+            self._directories[directory] = os.stat(directory).st_mtime_ns
+
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.path not in self._directories:
+                            yield from self._scan(entry.path)
+                    elif entry.name.endswith(SOURCE_SUFFIX):
+                        yield entry.path
+        # Removed, or not readable: listed again by the next poll that finds it, through its parent or as a root.
+        except OSError:
+            self._directories.pop(directory, None)
+
+    def _candidates(self) -> set[str]:
+        candidates = set(self.files)
+
+        for root in self.roots:
+            if os.path.isdir(root):
+                if root not in self._directories:
+                    candidates.update(self._scan(root))
+            else:
+                candidates.add(root)
+
+        for directory, mtime in list(self._directories.items()):
+            try:
+                changed = os.stat(directory).st_mtime_ns != mtime
+            except OSError:
+                del self._directories[directory]
+                continue
+
+            if changed:
+                candidates.update(self._scan(directory))
+
+        return candidates
+
+    def poll(self) -> list[Change]:
+        changes = []
+
+        for path in sorted(self._candidates()):
+            try:
+                status = os.stat(path)
+            except FileNotFoundError:
+                if self.files.pop(path, None) is not None:
+                    changes.append(Change(path, None, 0.0, removed=True))
+
+                continue
+            except OSError as error:
+                # Reported once, until the file can be stat'd again or fails otherwise.
+                diagnostic: Diagnostic | None = Diagnostic.from_error(error)
+                watched = self.files.get(path)
+
+                if watched is None or watched.stamp is not None or watched.diagnostic != diagnostic:
+                    self.files[path] = WatchedFile(None, watched.parse if watched is not None else None, diagnostic)
+                    changes.append(Change(path, diagnostic, 0.0))
+
+                continue
+
+            watched = self.files.get(path)
+
+            if watched is not None and watched.stamp == _stamp(status):
+                continue
+
+            start = time.perf_counter()
+            previous = watched.parse if watched is not None else None
+
+            try:
+                with open(path, encoding="utf-8") as file:
+                    source = file.read()
+
+                parse: IncrementalParse | None = parse_incremental(source, previous)
+                diagnostic = None
+            except (*SOURCE_ERRORS, OSError, ValueError) as error:
+                parse = previous
+                diagnostic = Diagnostic.from_error(error)
+
+            self.files[path] = WatchedFile(_stamp(status), parse, diagnostic)
+            changes.append(Change(path, diagnostic, time.perf_counter() - start))
+
+        return changes
+
+    def watch(self, interval: float = INTERVAL) -> Iterator[list[Change]]:
+        while True:
+            changes = self.poll()
+
+            if changes:
+                yield changes
+
+            time.sleep(interval)
+
+
+def _report(changes: list[Change], quiet: bool = False) -> None:
+    for change in changes:
+        if change.diagnostic is not None:
+            print(f"{change.path}: {change.diagnostic.kind}: {change.diagnostic.message}", file=sys.stderr)
+        elif change.removed:
+            print(f"{change.path}: removed")
+        elif not quiet:
+            print(f"{change.path}: ok ({change.seconds * 1000:.1f} ms)")
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(prog="python -m calcium.watch", description="Reparse Calcium files as they change.")
+    argument_parser.add_argument("paths", nargs="+", help=f"files, or directories searched for *{SOURCE_SUFFIX} files")
+    argument_parser.add_argument("--interval", type=float, default=INTERVAL, help="seconds between two polls")
+    arguments = argument_parser.parse_args()
+    watcher = Watcher(arguments.paths)
+    changes = watcher.poll()
+    _report(changes, quiet=True)
+    print(f"watching {len(changes)} files, {sum(1 for change in changes if change.diagnostic is not None)} with errors")
+
+    try:
+        for changes in watcher.watch(arguments.interval):
+            _report(changes)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
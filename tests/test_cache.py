@@ -0,0 +1,57 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import pickle
+import zlib
+
+import pytest
+
+from calcium.cache import CacheEntry, ParseCache
+from calcium.diagnostics import Diagnostic
+
+
+@pytest.mark.parametrize("entry", [
+    CacheEntry.from_source("struct S { var x: int; }"),
+    CacheEntry.from_terminals((), Diagnostic("CompilerSyntaxError", "unexpected é")),
+    CacheEntry.from_source("struct S {}")
+])
+def test_round_trip(entry: CacheEntry) -> None:
+    entry.forest = b"forest" if entry.diagnostic is None else None
+
+    assert CacheEntry.from_bytes(entry.to_bytes()) == entry
+
+
+def test_not_an_entry() -> None:
+    data = CacheEntry.from_source("struct S {}").to_bytes()
+
+    with pytest.raises(ValueError):
+        CacheEntry.from_bytes(zlib.compress(zlib.decompress(data)[:-1]))
+
+    with pytest.raises(ValueError):
+        CacheEntry.from_bytes(zlib.compress(pickle.dumps(("CACE", 4))))
+
+
+# A shared cache directory is only ever read as data: a pickle planted in it is a miss.
+def test_planted_pickle(tmp_path) -> None:
+    cache = ParseCache(str(tmp_path))
+    key = cache.key(b"struct S {}")
+    cache.put(key, CacheEntry.from_source("struct S {}"))
+
+    with open(cache._path(key), "wb") as file:
+        file.write(zlib.compress(pickle.dumps(OSError("planted"))))
+
+    assert cache.get(key) is None
+    assert cache.misses == 1
@@ -0,0 +1,126 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import pytest
+
+from alchemist.front.lexer import Terminal
+from alchemist.front.parser import GraphNode, Production
+
+from calcium.forest import FormatError, NodeView, dump, forest_root, load, load_file
+from calcium.lexer import CalciumLexer, ReplayLexer
+from calcium.parser import CalciumParser
+
+SOURCES = [
+    "struct S {}",
+    "package p; import a, b as e from d; public struct S { var x: int; func f(a: int, b: bool) { } static { } }",
+    "enum E { A, B; var x: int; }",
+    # Prefix, postfix and ternary operators, which derive Operand productions.
+    "struct S { var a: int = &b.d; var e: int = f ? g : h ? i : j; var k: int = l(m, &n)[o]->p; }"
+]
+
+
+# The parse replays the terminals dumped, so that the forest refers to the same ones.
+def _parsed(source: str) -> tuple[GraphNode, list[Terminal]]:
+    terminals = list(CalciumLexer(source).terminals())
+    return forest_root(CalciumParser(ReplayLexer(source, terminals)).parse()), terminals
+
+
+def _terminal(node: GraphNode) -> Terminal | None:
+    return node.path if not isinstance(node, Production) and isinstance(node.path, Terminal) else None
+
+
+# Walks both graphs together: every node must match its view in kind, terminal and children, and a node shared in the
+# original must be the same node in the forest.
+def _assert_same(root: GraphNode, view: NodeView) -> int:
+    indices = {id(root): view.index}
+    pending = [(root, view)]
+
+    while pending:
+        node, node_view = pending.pop()
+        terminal = _terminal(node)
+        kind = type(terminal or node).__name__
+        assert node_view.kind == kind
+
+        if terminal is None:
+            assert node_view.terminal is None
+        else:
+            assert node_view.terminal is not None
+            assert (node_view.terminal.kind, node_view.terminal.string) == (type(terminal).__name__, terminal.string)
+            assert (node_view.terminal.start_position, node_view.terminal.end_position) == (terminal.start_position, terminal.end_position)
+
+        assert len(node_view.children) == len(node.children)
+
+        for child, child_view in zip(node.children, node_view.children):
+            if id(child) in indices:
+                assert child_view.index == indices[id(child)]
+            else:
+                indices[id(child)] = child_view.index
+                pending.append((child, child_view))
+
+    return len(indices)
+
+
+@pytest.mark.parametrize("source", SOURCES)
+def test_round_trip(source: str) -> None:
+    root, terminals = _parsed(source)
+    forest = load(dump(root, terminals))
+
+    assert forest.root is not None
+    assert _assert_same(root, forest.root) == len(forest)
+    assert [(terminal.kind, terminal.string, terminal.start_position, terminal.end_position) for terminal in forest.iter_terminals()] == \
+        [(type(terminal).__name__, terminal.string, terminal.start_position, terminal.end_position) for terminal in terminals]
+
+
+def test_operands_round_trip() -> None:
+    root, terminals = _parsed(SOURCES[-1])
+    forest = load(dump(root, terminals))
+    kinds = {forest.string(forest.nodes[2 * index]) for index in range(len(forest))}
+
+    assert {"Operand1", "Operand13"} <= kinds
+
+
+def test_load_file(tmp_path) -> None:
+    root, terminals = _parsed(SOURCES[1])
+    path = tmp_path / "forest"
+    path.write_bytes(dump(root, terminals))
+    forest = load_file(str(path))
+
+    assert forest.root is not None
+    assert _assert_same(root, forest.root) == len(forest)
+
+
+def test_empty() -> None:
+    forest = load(dump())
+
+    assert forest.root is None
+    assert len(forest) == 0
+    assert list(forest.iter_terminals()) == []
+
+
+def test_format_errors() -> None:
+    data = dump(*_parsed(SOURCES[0]))
+
+    with pytest.raises(FormatError):
+        load(data[:10])
+
+    with pytest.raises(FormatError):
+        load(b"XXXX" + data[4:])
+
+    with pytest.raises(FormatError):
+        load(data[:4] + (99).to_bytes(4, "little") + data[4 + 4:])
+
+    with pytest.raises(FormatError):
+        load(data + b"\0")
@@ -0,0 +1,151 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import random
+
+import pytest
+
+from calcium.diagnostics import SOURCE_ERRORS
+from calcium.incremental import Edit, IncrementalParse, error_span, parse_incremental, reparse
+from calcium.lexer import CalciumLexer
+from calcium.parser import CalciumParser
+from calcium.stream import lex
+
+BASE = """package p;
+import a, b as e from d;
+public struct S {
+    var x: int = (y ? f(g, &h) : k[l]); // comment
+    /* comment */ func m(q: int) -> int { BlockStatement }
+    static { BlockStatement }
+    var z: int = w;
+}
+"""
+
+SOURCES = [
+    BASE,
+    "enum E { A, B; var x: int; }",
+    "union U { int, bool; var x: int; }",
+    # Out of the order of CompilationUnit.
+    "import a from b; package p; struct S {}",
+    "struct S {} package p;",
+    # Empty members, which the stand-ins would hide.
+    "enum E { A,, B }",
+    "enum E { A, B, }",
+    "enum E { , A }",
+    "struct S { var x: int;; }",
+    "struct S { var x: int = ; }",
+    "struct S {",
+    ""
+]
+
+# Inserted or replacing text, chosen to open and close comments, nesting and declarations across the source.
+SNIPPETS = ["", " ", "x", "(", ")", ";", "/*", "*/", "//", "\n", "var n: int = 1;", ",", "{", "}", "package q;", "import r from t;", ".", "?",
+            ":"]
+
+
+def _accepts(source: str) -> bool:
+    try:
+        CalciumParser(CalciumLexer(source)).parse()
+    except SOURCE_ERRORS:
+        return False
+
+    return True
+
+
+def _parse(source: str, previous: IncrementalParse | None = None) -> IncrementalParse | None:
+    try:
+        return parse_incremental(source, previous)
+    except SOURCE_ERRORS:
+        return None
+
+
+@pytest.mark.parametrize("source", SOURCES)
+def test_accepts_as_parser(source: str) -> None:
+    assert (_parse(source) is not None) == _accepts(source)
+
+
+@pytest.mark.parametrize("source", SOURCES)
+def test_reparse_accepts_as_parser(source: str) -> None:
+    previous = parse_incremental(BASE)
+
+    try:
+        reparse(previous, Edit(0, len(BASE), source))
+    except SOURCE_ERRORS:
+        assert not _accepts(source)
+    else:
+        assert _accepts(source)
+
+
+# Random edits of a valid source, each kept when it parses: the incremental parse must accept exactly what the parser
+# does, with the terminals of a full lex.
+def test_random_edits() -> None:
+    rng = random.Random(0)
+
+    for _ in range(100):
+        previous = parse_incremental(BASE)
+
+        for _ in range(3):
+            source = previous.source
+            start = rng.randrange(len(source) + 1)
+            end = min(len(source), start + rng.choice([0, 0, 1, 2, 5]))
+            edited = source[:start] + rng.choice(SNIPPETS) + source[end:]
+            result = _parse(edited, previous)
+
+            assert (result is not None) == _accepts(edited), edited
+
+            if result is not None:
+                assert result.tokens == list(lex(edited))
+                previous = result
+
+
+def test_reuses_unchanged_members() -> None:
+    previous = parse_incremental(BASE)
+    start = BASE.index("var z")
+    result = reparse(previous, Edit(start + len("var "), start + len("var z"), "renamed"))
+    members = [(member.kind, member.node) for member in previous.pieces[-1].members]
+    edited = [(member.kind, member.node) for member in result.pieces[-1].members]
+
+    assert edited[:-1] == members[:-1]
+    assert edited[-1] != members[-1]
+    assert result.source[result.pieces[-1].members[-1].start:result.pieces[-1].members[-1].end] == "var renamed: int = w;"
+
+
+def test_comment_opened_by_edit() -> None:
+    previous = parse_incremental(BASE)
+    start = BASE.index("static")
+    result = _parse(BASE[:start] + "/*" + BASE[start:], previous)
+
+    assert result is None
+    assert not _accepts(BASE[:start] + "/*" + BASE[start:])
+    result = reparse(previous, Edit(start, start, "// "))
+
+    assert result.tokens == list(lex(result.source))
+
+
+@pytest.mark.parametrize("broken, piece", [
+    ("var z: int = w;", "var z: int = ;"),
+    ("import a, b as e from d;", "import a, as e from d;"),
+    ("public struct S {", "public struct {")
+])
+def test_error_span(broken: str, piece: str) -> None:
+    source = BASE.replace(broken, piece)
+
+    with pytest.raises(SOURCE_ERRORS) as raised:
+        parse_incremental(source, parse_incremental(BASE))
+
+    span = error_span(raised.value)
+    assert span is not None
+    assert piece in source[span[0]:span[1]]
@@ -0,0 +1,61 @@
+# This file is part of the Calcium language implementation
+# Copyright (C) 2023  Natan Junges <natanajunges@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import pytest
+
+from calcium.merkle import diff, hash_declarations
+from calcium.parser import StructDeclaration, FieldDeclaration, MethodDeclaration, StaticInitializer
+
+BASE = "struct S { public var x: int; func f() { } func f(a: int) { } static { } }"
+
+
+def _changes(old: str, new: str) -> list[tuple[str, str]]:
+    return sorted((change.status, change.path) for change in diff(old, new))
+
+
+def test_paths() -> None:
+    declaration = hash_declarations(BASE)
+    kinds = [(member.path, member.kind) for member in declaration.walk()]
+    assert [kind for _, kind in kinds] == [StructDeclaration, FieldDeclaration, MethodDeclaration, MethodDeclaration, StaticInitializer]
+    assert kinds[0][0] == "S" and kinds[1][0] == "S.x" and kinds[4][0] == "S.StaticInitializer"
+    assert kinds[2][0] != kinds[3][0] and all(path.startswith("S.f[") for path, _ in kinds[2:4])
+
+
+def test_unchanged() -> None:
+    assert diff(BASE, BASE.replace(" ", "  ")) == []
+
+
+@pytest.mark.parametrize("new", [
+    # The modifiers belong to the member they modify.
+    BASE.replace("public var", "private static var"),
+    BASE.replace("public var", "var"),
+    BASE.replace("int;", "bool;")
+])
+def test_member_changed(new: str) -> None:
+    assert _changes(BASE, new) == [("changed", "S"), ("changed", "S.x")]
+
+
+def test_member_added_and_removed() -> None:
+    changes = _changes(BASE, BASE.replace("public var x: int;", "var y: int;"))
+    assert changes == [("added", "S.y"), ("changed", "S"), ("removed", "S.x")]
+
+
+def test_declaration_changed() -> None:
+    assert _changes(BASE, "public " + BASE) == [("changed", "S")]
+
+
+def test_enum_constants() -> None:
+    assert _changes("enum E { A, B }", "enum E { A, C }") == [("added", "E.C"), ("changed", "E"), ("removed", "E.B")]